@@ -215,3 +215,8 @@ class SightseeingMasterAdmin(admin.ModelAdmin):
     search_fields = ('name', 'city', 'description')
     inlines = [SightseeingImageInline]
 
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
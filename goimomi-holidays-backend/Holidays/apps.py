@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class HolidaysConfig(AppConfig):
     name = 'Holidays'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+import json
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .models import VehicleMaster, VehicleRoute
+
+
+def normalize_city(value):
+    # "Dubai (DXB)" / "Dubai, UAE" -> "dubai"
+    value = str(value or '').strip().lower()
+    return value.split('(')[0].split(',')[0].strip() or value
+
+
+# VehicleRoute.price is DecimalField(max_digits=12, decimal_places=2)
+PRICE_PLACES = Decimal('0.01')
+MAX_PRICE_DIGITS = 10
+
+
+def parse_price(value):
+    # "1,200" -> Decimal('1200.00'); None for blanks, NaN/Infinity, values
+    # that do not fit the route table and anything not above zero
+    try:
+        price = Decimal(str(value).strip().replace(',', ''))
+        if not price.is_finite():
+            return None
+        price = price.quantize(PRICE_PLACES, rounding=ROUND_HALF_UP)
+        if price <= 0 or price.adjusted() >= MAX_PRICE_DIGITS:
+            return None
+    except (InvalidOperation, ValueError):
+        return None
+    return price
+
+
+def build_vehicle_lookup():
+    # Lower-cased column name -> VehicleMaster, loaded in one query.
+    # Exact model names win over "brand name" matches, and older vehicles win ties.
+    vehicles = list(VehicleMaster.objects.select_related('brand').order_by('-id'))
+    lookup = {}
+    for v in vehicles:
+        full_name = f"{v.brand.name} {v.name}" if v.brand else v.name
+        if full_name:
+            lookup[full_name.lower()] = v
+    for v in vehicles:
+        if v.name:
+            lookup[v.name.lower()] = v
+    return lookup
+
+
+def build_routes(rate_card, vehicle_lookup=None):
+    routes = rate_card.routes or []
+    if isinstance(routes, str):
+        try: routes = json.loads(routes)
+        except ValueError: routes = []
+
+    column_vehicles = [v.strip() if v else "" for v in (rate_card.column_vehicles or [])]
+    if vehicle_lookup is None:
+        vehicle_lookup = build_vehicle_lookup()
+
+    rows = []
+    for route in routes:
+        if not isinstance(route, dict):
+            continue
+        from_key = normalize_city(route.get('start_city'))
+        to_key = normalize_city(route.get('drop_city'))
+        if not from_key or not to_key:
+            continue
+        for i, v_name in enumerate(column_vehicles):
+            if not v_name:
+                continue
+            price = parse_price(route.get(f'v{i+1}'))
+            if price is None:
+                continue
+            rows.append(VehicleRoute(
+                rate_card=rate_card,
+                vehicle=vehicle_lookup.get(v_name.lower()),
+                vehicle_name=v_name,
+                from_key=from_key[:255],
+                to_key=to_key[:255],
+                pickup_point=route.get('start_from'),
+                drop_point=route.get('drop_to'),
+                price=price,
+                validity_start=rate_card.validity_start,
+                validity_end=rate_card.validity_end,
+            ))
+    return rows
+
+
+def rebuild_routes(rate_card):
+    rows = build_routes(rate_card)
+    with transaction.atomic():
+        rate_card.route_index.all().delete()
+        VehicleRoute.objects.bulk_create(rows, batch_size=1000)
+
+
+def relink_route_vehicles():
+    # Re-resolve indexed routes after vehicles or brands are added, renamed or removed
+    vehicle_lookup = build_vehicle_lookup()
+    names = VehicleRoute.objects.values_list('vehicle_name', flat=True).distinct()
+    with transaction.atomic():
+        for name in list(names):
+            vehicle = vehicle_lookup.get(name.lower())
+            VehicleRoute.objects.filter(vehicle_name=name).exclude(vehicle=vehicle).update(vehicle=vehicle)
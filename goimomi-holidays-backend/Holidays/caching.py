@@ -0,0 +1,158 @@
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.core.cache import caches
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from .models import CollectionVersion
+
+API_CACHE = 'api'
+
+
+def collection_name(model):
+    return model._meta.label
+
+
+def get_collection_versions(models):
+    names = [collection_name(model) for model in models]
+    stamps = {
+        row.name: row
+        for row in CollectionVersion.objects.filter(name__in=names)
+    }
+    return [stamps.get(name) for name in names]
+
+
+def bump_collections(models):
+    now = timezone.now()
+    for model in models:
+        name = collection_name(model)
+        updated = CollectionVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            CollectionVersion.objects.get_or_create(name=name)
+
+
+def record_cache_lookup(name, hit, elapsed):
+    # Hit/miss counters and total latency in microseconds, kept in the api cache
+    cache = caches[API_CACHE]
+    outcome = 'hit' if hit else 'miss'
+    for key, delta in ((f"stats:{name}:{outcome}", 1), (f"stats:{name}:{outcome}_us", int(elapsed * 1_000_000))):
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.set(key, delta, timeout=None)
+
+
+def get_cache_stats(name):
+    keys = [f"stats:{name}:{field}" for field in ('hit', 'hit_us', 'miss', 'miss_us')]
+    values = caches[API_CACHE].get_many(keys)
+    hits, hit_us, misses, miss_us = (values.get(key, 0) for key in keys)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "avg_hit_ms": round(hit_us / hits / 1000, 3) if hits else None,
+        "avg_miss_ms": round(miss_us / misses / 1000, 3) if misses else None,
+    }
+
+
+class CollectionVersionMixin:
+    # Collections a response depends on; defaults to the viewset's own model.
+    # signals.py bumps a collection whenever one of its models is written.
+    cache_collections = ()
+
+    def get_cache_collections(self):
+        return self.cache_collections or (self.queryset.model,)
+
+    def get_collection_stamps(self):
+        # Looked up once per request and shared by the mixins below
+        if not hasattr(self, '_collection_stamps'):
+            self._collection_stamps = get_collection_versions(self.get_cache_collections())
+        return self._collection_stamps
+
+    def get_collection_key(self, request):
+        versions = [stamp.version if stamp else 0 for stamp in self.get_collection_stamps()]
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        # File and image URLs are absolute, so the host is part of the key
+        return f"{request.build_absolute_uri(request.path)}?{query}|{versions}"
+
+
+class CachedListMixin(CollectionVersionMixin):
+    # Serves list responses from the "api" cache as pre-rendered JSON bytes.
+    # Keys include the collection versions, so a write makes older entries unreachable.
+
+    def get_list_cache_key(self, request):
+        return f"list:{hashlib.sha256(self.get_collection_key(request).encode()).hexdigest()}"
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        cache = caches[API_CACHE]
+        key = self.get_list_cache_key(request)
+        body = cache.get(key)
+        hit = body is not None
+        if not hit:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            body = JSONRenderer().render(response.data)
+            cache.set(key, body)
+
+        response = HttpResponse(body, content_type='application/json')
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+
+class ConditionalGetMixin(CollectionVersionMixin):
+    # Strong ETag and Last-Modified validators for list and retrieve, derived
+    # from the collection versions. Matching requests get a 304 before the
+    # queryset or serializer runs.
+    # Set for responses that also change when the date rolls over.
+    conditional_on_date = False
+
+    def get_validators(self, request):
+        key = self.get_collection_key(request)
+        modified = [stamp.updated_at for stamp in self.get_collection_stamps() if stamp]
+        if self.conditional_on_date:
+            today = timezone.now().date()
+            key = f"{key}|{today}"
+            modified.append(datetime.combine(today, time.min, tzinfo=dt_timezone.utc))
+        etag = quote_etag(hashlib.sha256(key.encode()).hexdigest())
+        last_modified = int(max(modified).timestamp()) if modified else None
+        return etag, last_modified
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            # A 304 carries the same validators as the 200 it stands for
+            if not_modified.status_code == status.HTTP_304_NOT_MODIFIED:
+                self.set_validators(not_modified, etag, last_modified)
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Clients may store the body but must revalidate it
+        patch_cache_control(response, no_cache=True)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
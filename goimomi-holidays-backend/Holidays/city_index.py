@@ -0,0 +1,152 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from .cab_routes import normalize_city
+from .caching import get_collection_versions
+from .models import Destination, PickupPointMaster, StartingCity
+
+INDEX_COLLECTIONS = (StartingCity, Destination, PickupPointMaster)
+IATA_CODE = re.compile(r'\(\s*([A-Z]{3})\s*\)')
+NON_WORD = re.compile(r'[\W_]+')
+
+# Minimum trigram similarity for typo matches in search and suggestions
+SEARCH_SIMILARITY = 0.5
+SUGGEST_SIMILARITY = 0.3
+
+
+def normalize_alias(value):
+    # "Delhi (DEL)" -> "delhi del"
+    return NON_WORD.sub(' ', str(value or '')).strip().lower()
+
+
+def trigrams(alias):
+    padded = f"  {alias} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityIndex:
+    # In-memory alias index over the city master data. Canonical keys are the
+    # normalize_city() keys that VehicleRoute rows are stored under.
+
+    def __init__(self):
+        self.aliases = defaultdict(set)
+        self.labels = {}
+        self.codes = {}
+        self.sorted_aliases = []
+        self.trigrams = defaultdict(set)
+        self.gram_counts = {}
+
+    def add(self, key, name, *aliases):
+        if not key:
+            return
+        self.labels.setdefault(key, str(name).strip())
+        codes = tuple(match.group(1) for value in (name,) + aliases for match in IATA_CODE.finditer(value or ''))
+        if codes:
+            self.codes.setdefault(key, codes[0])
+        for alias in (key, name) + aliases + codes:
+            alias = normalize_alias(alias)
+            if alias:
+                self.aliases[alias].add(key)
+
+    def finalize(self):
+        self.sorted_aliases = sorted(self.aliases)
+        for alias in self.sorted_aliases:
+            grams = trigrams(alias)
+            self.gram_counts[alias] = len(grams)
+            for gram in grams:
+                self.trigrams[gram].add(alias)
+        return self
+
+    def exact(self, query):
+        keys = set(self.aliases.get(normalize_alias(query), ()))
+        keys.update(self.aliases.get(normalize_alias(normalize_city(query)), ()))
+        return keys
+
+    def prefix(self, query):
+        alias = normalize_alias(query)
+        if not alias:
+            return []
+        matches = []
+        for candidate in self.sorted_aliases[bisect_left(self.sorted_aliases, alias):]:
+            if not candidate.startswith(alias):
+                break
+            matches.append(candidate)
+        return matches
+
+    def similar(self, query, threshold):
+        # Aliases ranked by trigram (Jaccard) similarity to the query
+        alias = normalize_alias(query)
+        if not alias:
+            return []
+        grams = trigrams(alias)
+        shared = Counter()
+        for gram in grams:
+            for candidate in self.trigrams.get(gram, ()):
+                shared[candidate] += 1
+        scored = []
+        for candidate, count in shared.items():
+            score = count / (len(grams) + self.gram_counts[candidate] - count)
+            if score >= threshold:
+                scored.append((-score, candidate))
+        return [candidate for _, candidate in sorted(scored)]
+
+    def resolve(self, query):
+        # Exact alias matches, else the single closest alias within typo distance
+        keys = self.exact(query)
+        if not keys:
+            similar = self.similar(query, SEARCH_SIMILARITY)
+            if similar:
+                keys = set(self.aliases[similar[0]])
+        return keys
+
+    def route_keys(self, query):
+        # Keys to search VehicleRoute with; the literal key is kept so cities
+        # that only appear on rate cards still match
+        keys = self.resolve(query)
+        literal = normalize_city(query)
+        if literal:
+            keys.add(literal)
+        return sorted(keys)
+
+    def suggest(self, query, limit=10):
+        keys = []
+        candidates = sorted(self.exact(query)) + [
+            key
+            for alias in self.prefix(query) + self.similar(query, SUGGEST_SIMILARITY)
+            for key in sorted(self.aliases[alias])
+        ]
+        for key in candidates:
+            if key not in keys:
+                keys.append(key)
+            if len(keys) >= limit:
+                break
+        return [{"key": key, "name": self.labels[key], "code": self.codes.get(key)} for key in keys]
+
+
+def build_city_index():
+    index = CityIndex()
+    for name in StartingCity.objects.values_list('name', flat=True):
+        index.add(normalize_city(name), name)
+    for name, city in Destination.objects.values_list('name', 'city'):
+        index.add(normalize_city(name), name)
+        if city:
+            index.add(normalize_city(city), city)
+    # Pickup points ("Dubai International Airport (DXB)") are aliases of their city
+    for point, city in PickupPointMaster.objects.values_list('name', 'city__name'):
+        index.add(normalize_city(city), city, point)
+    return index.finalize()
+
+
+_cached_index = (None, None)
+
+
+def get_city_index():
+    # Rebuilt per process whenever one of the source collections is written
+    global _cached_index
+    versions = tuple(stamp.version if stamp else 0 for stamp in get_collection_versions(INDEX_COLLECTIONS))
+    cached_versions, index = _cached_index
+    if cached_versions != versions:
+        index = build_city_index()
+        _cached_index = (versions, index)
+    return index
@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+
+
+class Command(BaseCommand):
+    help = 'Measures per-request database overhead with and without persistent connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--conn-max-age', type=int, default=60, help='CONN_MAX_AGE to compare against closing every request.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        self.stdout.write(f"{connection.vendor} {connection.settings_dict.get('HOST') or connection.settings_dict['NAME']}, {options['requests']} requests")
+        for label, max_age in (('CONN_MAX_AGE=0', 0), (f"CONN_MAX_AGE={options['conn_max_age']}", options['conn_max_age'])):
+            timings, connects = self.run(connection, max_age, options['requests'])
+            timings.sort()
+            self.stdout.write(
+                f"{label:>18}: avg {statistics.mean(timings):.3f} ms, "
+                f"p50 {timings[len(timings) // 2]:.3f} ms, p95 {timings[int(len(timings) * 0.95)]:.3f} ms, "
+                f"{connects} connects"
+            )
+
+    def run(self, connection, max_age, requests):
+        # Replays the request_started/request_finished cycle Django runs around
+        # every request, with one trivial query in between
+        original = connection.settings_dict['CONN_MAX_AGE']
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        timings, connects = [], 0
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                close_old_connections()
+                if connection.connection is None:
+                    connects += 1
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                close_old_connections()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = original
+        return timings, connects
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Holidays.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes abandoned and attached upload sessions together with their partial files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=float, default=48,
+            help='Delete sessions not touched for this many hours.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = expire_sessions(options['max_age'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {deleted} upload sessions deleted"))
@@ -0,0 +1,63 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from Holidays.models import ImageRendition, MediaBlob
+from Holidays.storage import CAS_DIR, ContentAddressedStorage
+
+
+def count_references():
+    # Every content-addressed name held by a FileField or a rendition map
+    references = Counter()
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField) and not field.many_to_many:
+                names = model._default_manager.filter(
+                    **{f'{field.attname}__startswith': f'{CAS_DIR}/'}
+                ).values_list(field.attname, flat=True)
+                references.update(names.iterator())
+    for renditions in ImageRendition.objects.values_list('renditions', flat=True).iterator():
+        for sizes in (renditions or {}).values():
+            references.update(name for name in sizes.values() if name.startswith(f'{CAS_DIR}/'))
+    return references
+
+
+class Command(BaseCommand):
+    help = 'Reconciles MediaBlob reference counts and deletes content-addressed files nothing references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing or deleting.')
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Only delete blobs untouched for this many hours, so uploads whose row is not saved yet survive.',
+        )
+
+    def handle(self, *args, **options):
+        storage = ContentAddressedStorage()
+        references = count_references()
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+        dry_run = options['dry_run']
+        corrected = deleted = freed = 0
+
+        for blob in MediaBlob.objects.iterator():
+            refcount = references.get(blob.name, 0)
+            if refcount != blob.refcount:
+                corrected += 1
+                if not dry_run:
+                    # Skipped if an upload or delete touched the row meanwhile
+                    MediaBlob.objects.filter(pk=blob.pk, updated_at=blob.updated_at).update(refcount=refcount)
+                blob.refcount = refcount
+            if refcount or blob.updated_at >= cutoff:
+                continue
+            if dry_run or storage.purge(blob):
+                deleted += 1
+                freed += blob.size
+
+        prefix = 'Would' if dry_run else 'Did'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} correct {corrected} reference counts and delete {deleted} blobs ({freed / 1024 / 1024:.1f} MB)"
+        ))
@@ -0,0 +1,175 @@
+import os
+import shutil
+import time
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.db.models import Q
+
+from Holidays.models import ImageRendition
+from Holidays.renditions import RENDITION_DIR
+from Holidays.storage import CAS_DIR
+
+# Blobs are reference counted and collected by gc_media_blobs
+SKIPPED_DIRS = {CAS_DIR}
+# Prefix lookups per query; keeps the OR chain within SQLite's expression depth
+STEMS_PER_QUERY = 200
+
+
+def file_fields():
+    # (model, field name) for every FileField/ImageField of the installed apps
+    return [
+        (model, field.attname)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+
+
+def walk_media(root, skipped, min_mtime):
+    # Streams relative paths of files older than min_mtime, one directory at a time
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        with os.scandir(os.path.join(root, relative_dir)) as entries:
+            for entry in entries:
+                relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if relative not in skipped:
+                        stack.append(relative)
+                elif entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < min_mtime:
+                    yield relative
+
+
+def referenced_names(fields, names):
+    referenced = set()
+    for model, attname in fields:
+        referenced.update(
+            model._default_manager.filter(**{f'{attname}__in': names}).values_list(attname, flat=True)
+        )
+    return referenced
+
+
+def rendition_stems(name):
+    # "renditions/packages/cards/a_320.webp" -> {"packages/cards/a"}. Storage
+    # may have appended a "_Ab3dE9x" suffix on a name clash, so both readings
+    # are tried; the match is confirmed against the rendition records.
+    base = os.path.splitext(name[len(RENDITION_DIR) + 1:])[0]
+    parts = base.rsplit('_', 2)
+    stems = set()
+    if len(parts) >= 2 and parts[-1].isdigit():
+        stems.add(base.rsplit('_', 1)[0])
+    if len(parts) == 3 and parts[1].isdigit() and len(parts[2]) == 7:
+        stems.add(parts[0])
+    return stems
+
+
+def live_renditions(fields, names):
+    # Rendition files listed by an ImageRendition whose source image is
+    # still referenced; renditions of deleted images count as orphaned
+    stems = sorted(set().union(*(rendition_stems(name) for name in names)))
+    rows = []
+    for i in range(0, len(stems), STEMS_PER_QUERY):
+        rows += ImageRendition.objects.filter(reduce(or_, (
+            Q(source__startswith=f"{stem}.") for stem in stems[i:i + STEMS_PER_QUERY]
+        ))).values_list('source', 'renditions')
+    sources = referenced_names(fields, [source for source, _ in rows])
+    return {
+        name
+        for source, renditions in rows if source in sources
+        for sizes in (renditions or {}).values()
+        for name in sizes.values()
+    }
+
+
+def stale_rendition_batches(fields, batch_size):
+    # Ids of ImageRendition rows whose source image is no longer referenced,
+    # one batch at a time. Paged by id rather than a cursor, so the caller
+    # can delete each batch before the next is read.
+    last_id = 0
+    while True:
+        batch = list(
+            ImageRendition.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'source')[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        sources = referenced_names(fields, [source for _, source in batch])
+        yield [pk for pk, source in batch if source not in sources]
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes or quarantines media files that no FileField references, and renditions '
+        'of images that are gone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the orphaned files.')
+        parser.add_argument('--delete', action='store_true', help='Delete orphans instead of moving them to the quarantine directory.')
+        parser.add_argument(
+            '--quarantine-dir', default=os.path.join(os.path.dirname(os.path.normpath(settings.MEDIA_ROOT)), 'media_quarantine'),
+            help='Where orphans are moved, keeping their relative paths. Defaults to media_quarantine next to MEDIA_ROOT.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Only consider files older than this many hours, so uploads whose row is not saved yet survive.',
+        )
+        parser.add_argument('--verbose-files', action='store_true', help='Print every orphaned path.')
+
+    def handle(self, *args, **options):
+        root = os.path.normpath(settings.MEDIA_ROOT)
+        if not os.path.isdir(root):
+            raise CommandError(f"MEDIA_ROOT {root} does not exist")
+        quarantine = os.path.normpath(options['quarantine_dir'])
+        skipped = set(SKIPPED_DIRS)
+        if os.path.dirname(quarantine) == root:
+            skipped.add(os.path.basename(quarantine))
+
+        fields = file_fields()
+        files = walk_media(root, skipped, time.time() - options['min_age'] * 3600)
+        scanned = orphaned = freed = 0
+        while True:
+            batch = list(islice(files, options['batch_size']))
+            if not batch:
+                break
+            scanned += len(batch)
+            renditions = [name for name in batch if name.startswith(f"{RENDITION_DIR}/")]
+            referenced = referenced_names(fields, batch) | (live_renditions(fields, renditions) if renditions else set())
+            orphans = [name for name in batch if name not in referenced]
+            for name in orphans:
+                path = os.path.join(root, name)
+                freed += os.path.getsize(path)
+                if options['verbose_files'] or options['dry_run']:
+                    self.stdout.write(name)
+                if options['dry_run']:
+                    continue
+                if options['delete']:
+                    os.remove(path)
+                else:
+                    target = os.path.join(quarantine, name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+            orphaned += len(orphans)
+
+        # Rendition records of deleted images; their files were handled above
+        stale = 0
+        for ids in stale_rendition_batches(fields, options['batch_size']):
+            stale += len(ids)
+            if ids and not options['dry_run']:
+                ImageRendition.objects.filter(pk__in=ids).delete()
+
+        if options['dry_run']:
+            action = 'would be removed'
+        else:
+            action = 'deleted' if options['delete'] else f'moved to {quarantine}'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} files: {orphaned} orphaned ({freed / 1024 / 1024:.1f} MB) {action}; "
+            f"{stale} stale rendition records {'found' if options['dry_run'] else 'deleted'}"
+        ))
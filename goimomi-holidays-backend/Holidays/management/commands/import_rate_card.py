@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Holidays.models import VehicleRateCard
+from Holidays.rate_card_import import RateCardImportError, import_rate_card
+
+
+class Command(BaseCommand):
+    help = 'Replaces the routes of a vehicle rate card with the rows of a CSV or XLSX rate sheet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('rate_card_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the sheet without writing any routes.')
+
+    def handle(self, *args, **options):
+        try:
+            rate_card = VehicleRateCard.objects.get(pk=options['rate_card_id'])
+        except VehicleRateCard.DoesNotExist:
+            raise CommandError(f"Rate card {options['rate_card_id']} does not exist")
+
+        try:
+            with open(options['path'], 'rb') as sheet:
+                report = import_rate_card(rate_card, sheet, options['path'], dry_run=options['dry_run'])
+        except (OSError, RateCardImportError) as e:
+            raise CommandError(str(e))
+
+        for entry in report['errors']:
+            self.stderr.write(f"Row {entry['row']}: {'; '.join(entry['errors'])}")
+        if report['unknown_vehicles']:
+            self.stderr.write(f"Unknown vehicles: {', '.join(report['unknown_vehicles'])}")
+        summary = {key: report[key] for key in ('rows', 'imported', 'routes', 'error_count')}
+        self.stdout.write(self.style.SUCCESS(json.dumps(summary)))
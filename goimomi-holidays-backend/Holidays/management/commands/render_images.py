@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Holidays.renditions import MAX_ATTEMPTS, queue_existing_images, render_pending_images
+
+
+class Command(BaseCommand):
+    help = 'Renders queued images into resized WebP/AVIF renditions, retrying failures with exponential backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+        parser.add_argument('--backfill', action='store_true', help='Queue every image already stored before rendering.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting once it is drained.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait between polls with --loop.')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f"Checked {queue_existing_images()} records for images")
+
+        total_rendered = total_failed = 0
+        while True:
+            rendered, failed = render_pending_images(options['batch_size'], options['max_attempts'])
+            total_rendered += rendered
+            total_failed += failed
+            if rendered or failed:
+                self.stdout.write(f"Rendered {rendered}, failed {failed}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_rendered} rendered, {total_failed} failed"))
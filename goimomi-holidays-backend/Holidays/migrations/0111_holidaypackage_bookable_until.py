@@ -0,0 +1,48 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:12
+
+import json
+from datetime import date, datetime
+
+from django.db import migrations, models
+
+
+def backfill_bookable_until(apps, schema_editor):
+    HolidayPackage = apps.get_model('Holidays', 'HolidayPackage')
+
+    packages = []
+    for pkg in HolidayPackage.objects.filter(fixed_departure=True).only('id', 'fixed_departure_data'):
+        if not pkg.fixed_departure_data:
+            continue
+        try:
+            data = pkg.fixed_departure_data
+            if isinstance(data, str):
+                data = json.loads(data)
+            latest = None
+            for slot in data:
+                valid_until_str = slot.get('booking_valid_until')
+                if valid_until_str:
+                    valid_until = datetime.strptime(valid_until_str, '%Y-%m-%d').date()
+                    if latest is None or valid_until > latest:
+                        latest = valid_until
+            pkg.bookable_until = latest or date.min
+        except (ValueError, TypeError, AttributeError):
+            continue
+        packages.append(pkg)
+
+    HolidayPackage.objects.bulk_update(packages, ['bookable_until'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0110_holidaypackage_terms_and_policies_raw'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holidaypackage',
+            name='bookable_until',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_bookable_until, migrations.RunPython.noop),
+    ]
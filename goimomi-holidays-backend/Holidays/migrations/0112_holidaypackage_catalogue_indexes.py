@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0111_holidaypackage_bookable_until'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['-created_at', '-id'], name='pkg_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['category'], name='pkg_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['Offer_price', 'id'], name='pkg_offer_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['days', 'id'], name='pkg_days_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['starting_city'], name='pkg_starting_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='holidaypackage',
+            index=models.Index(fields=['fixed_departure'], name='pkg_fixed_departure_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:46
+
+from django.db import migrations, models
+
+
+def backfill_country_key(apps, schema_editor):
+    Visa = apps.get_model('Holidays', 'Visa')
+
+    visas = list(Visa.objects.only('id', 'country'))
+    for visa in visas:
+        visa.country_key = " ".join((visa.country or "").split()).casefold()
+    Visa.objects.bulk_update(visas, ['country_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0113_collectionversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='visa',
+            name='country_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_country_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='visa',
+            index=models.Index(fields=['country_key', 'is_active'], name='visa_country_key_idx'),
+        ),
+    ]
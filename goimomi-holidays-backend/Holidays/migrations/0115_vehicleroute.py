@@ -0,0 +1,93 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:46
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from Holidays.cab_routes import parse_price
+
+
+def normalize_city(value):
+    value = str(value or '').strip().lower()
+    return value.split('(')[0].split(',')[0].strip() or value
+
+
+def backfill_routes(apps, schema_editor):
+    VehicleRateCard = apps.get_model('Holidays', 'VehicleRateCard')
+    VehicleMaster = apps.get_model('Holidays', 'VehicleMaster')
+    VehicleRoute = apps.get_model('Holidays', 'VehicleRoute')
+
+    vehicles_by_name = {}
+    for v in VehicleMaster.objects.select_related('brand').order_by('-id'):
+        full_name = f"{v.brand.name} {v.name}" if v.brand else v.name
+        if full_name:
+            vehicles_by_name[full_name.lower()] = v
+    for v in VehicleMaster.objects.order_by('-id'):
+        if v.name:
+            vehicles_by_name[v.name.lower()] = v
+
+    for rate_card in VehicleRateCard.objects.all():
+        routes = rate_card.routes or []
+        if isinstance(routes, str):
+            try: routes = json.loads(routes)
+            except ValueError: routes = []
+        column_vehicles = [v.strip() if v else "" for v in (rate_card.column_vehicles or [])]
+
+        rows = []
+        for route in routes:
+            if not isinstance(route, dict):
+                continue
+            from_key = normalize_city(route.get('start_city'))
+            to_key = normalize_city(route.get('drop_city'))
+            if not from_key or not to_key:
+                continue
+            for i, v_name in enumerate(column_vehicles):
+                if not v_name:
+                    continue
+                price = parse_price(route.get(f'v{i+1}'))
+                if price is None:
+                    continue
+                rows.append(VehicleRoute(
+                    rate_card=rate_card,
+                    vehicle=vehicles_by_name.get(v_name.lower()),
+                    vehicle_name=v_name,
+                    from_key=from_key[:255],
+                    to_key=to_key[:255],
+                    pickup_point=route.get('start_from'),
+                    drop_point=route.get('drop_to'),
+                    price=price,
+                    validity_start=rate_card.validity_start,
+                    validity_end=rate_card.validity_end,
+                ))
+        VehicleRoute.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0114_visa_country_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicle_name', models.CharField(max_length=255)),
+                ('from_key', models.CharField(max_length=255)),
+                ('to_key', models.CharField(max_length=255)),
+                ('pickup_point', models.TextField(blank=True, null=True)),
+                ('drop_point', models.TextField(blank=True, null=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('validity_start', models.DateField()),
+                ('validity_end', models.DateField()),
+                ('rate_card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_index', to='Holidays.vehicleratecard')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='routes', to='Holidays.vehiclemaster')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['from_key', 'to_key', 'validity_start', 'validity_end'], name='vehicle_route_lookup_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_routes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0115_vehicleroute'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vehicleroute',
+            name='vehicle_name',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
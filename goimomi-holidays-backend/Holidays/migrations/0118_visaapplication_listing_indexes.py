@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0117_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='visaapplication',
+            index=models.Index(fields=['-created_at', '-id'], name='visa_app_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visaapplication',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='visa_app_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visaapplication',
+            index=models.Index(fields=['visa', '-created_at', '-id'], name='visa_app_visa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visaapplication',
+            index=models.Index(fields=['application_type', '-created_at', '-id'], name='visa_app_type_idx'),
+        ),
+    ]
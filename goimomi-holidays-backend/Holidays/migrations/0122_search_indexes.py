@@ -0,0 +1,48 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:20
+
+from functools import reduce
+from operator import add
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Kept in step with SEARCH_SOURCES in Holidays/search.py
+SEARCH_INDEXES = [
+    ('HolidayPackage', 'holidaypackage_search_idx', (('title', 'A'), ('description', 'B'))),
+    ('Destination', 'destination_search_idx', (('name', 'A'), ('country', 'B'))),
+    ('SightseeingMaster', 'sightseeing_search_idx', (('name', 'A'), ('description', 'B'))),
+    ('Visa', 'visa_search_idx', (('title', 'A'), ('country', 'B'))),
+]
+
+
+def search_index(name, fields):
+    vector = reduce(add, (SearchVector(field, weight=weight, config='english') for field, weight in fields))
+    return GinIndex(vector, name=name)
+
+
+def create_search_indexes(apps, schema_editor):
+    # tsvector GIN indexes only exist on PostgreSQL; other databases use the
+    # icontains fallback in search.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, name, fields in SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model('Holidays', model_name), search_index(name, fields))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model_name, name, fields in SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model('Holidays', model_name), search_index(name, fields))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0121_upload_session'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
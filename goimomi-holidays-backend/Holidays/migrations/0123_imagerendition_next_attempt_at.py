@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Holidays', '0122_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='imagerendition',
+            name='image_rendition_status_idx',
+        ),
+        migrations.AddField(
+            model_name='imagerendition',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='imagerendition',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='image_rendition_due_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import json
+from datetime import date, datetime
+
 from django.db import models
+from django.utils import timezone
 
 
 class HolidayEnquiry(models.Model):
@@ -90,6 +94,9 @@ class HolidayPackage(models.Model):
     fixed_departure = models.BooleanField(default=False)
     package_categories = models.JSONField(default=list, blank=True, null=True) # ['Budget', 'Standard', 'Deluxe', 'Luxury', 'Premium']
     fixed_departure_data = models.JSONField(default=list, blank=True, null=True) 
+    # Latest booking_valid_until across fixed departure slots, derived on save.
+    # NULL means the package never expires (regular package or unreadable slot data).
+    bookable_until = models.DateField(null=True, blank=True, editable=False, db_index=True)
 
     starting_city = models.CharField(max_length=100)
     ending_city = models.CharField(max_length=100, blank=True, null=True)
@@ -142,6 +149,52 @@ class HolidayPackage(models.Model):
     terms_and_policies_raw = models.JSONField(default=list, blank=True, null=True)
     arrival_no_of_nights = models.CharField(max_length=50, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Catalogue cursor pagination and server-side filters
+            models.Index(fields=['-created_at', '-id'], name='pkg_created_id_idx'),
+            models.Index(fields=['category'], name='pkg_category_idx'),
+            models.Index(fields=['Offer_price', 'id'], name='pkg_offer_price_idx'),
+            models.Index(fields=['days', 'id'], name='pkg_days_idx'),
+            models.Index(fields=['starting_city'], name='pkg_starting_city_idx'),
+            models.Index(fields=['fixed_departure'], name='pkg_fixed_departure_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.bookable_until = self.compute_bookable_until()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'fixed_departure', 'fixed_departure_data'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'bookable_until'}
+        super().save(*args, **kwargs)
+
+    def compute_bookable_until(self):
+        if not self.fixed_departure or not self.fixed_departure_data:
+            return None
+        try:
+            data = self.fixed_departure_data
+            if isinstance(data, str):
+                data = json.loads(data)
+
+            latest = None
+            for slot in data:
+                valid_until_str = slot.get('booking_valid_until')
+                if valid_until_str:
+                    valid_until = datetime.strptime(valid_until_str, '%Y-%m-%d').date()
+                    if latest is None or valid_until > latest:
+                        latest = valid_until
+        except (ValueError, TypeError, AttributeError):
+            # If parsing fails, keep it bookable to be safe
+            return None
+        # Fixed departures without any booking date are never listed
+        return latest or date.min
+
+    @staticmethod
+    def public_filter():
+        # Packages the public catalogue shows: active, and fixed departures still open for booking
+        return models.Q(is_active=True) & (
+            models.Q(bookable_until__isnull=True) | models.Q(bookable_until__gte=timezone.now().date())
+        )
+
     def __str__(self):
         return self.title
 
@@ -315,6 +368,8 @@ class Country(models.Model):
 # Visa Models
 class Visa(models.Model):
     country = models.CharField(max_length=100)
+    # Normalized copy of country for indexed, case-insensitive lookups
+    country_key = models.CharField(max_length=100, editable=False, default='')
     title = models.CharField(max_length=200)
     ENTRY_TYPES = [
         ('Single-Entry Visa', 'Single-Entry Visa'),
@@ -358,10 +413,22 @@ class Visa(models.Model):
     
     def save(self, *args, **kwargs):
         self.selling_price = self.cost_price + self.service_charge
+        self.country_key = self.normalize_country(self.country)
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def normalize_country(value):
+        return " ".join((value or "").split()).casefold()
+
+    @staticmethod
+    def public_filter():
+        return models.Q(is_active=True)
+
     class Meta:
         ordering = ['country', 'selling_price']
+        indexes = [
+            models.Index(fields=['country_key', 'is_active'], name='visa_country_key_idx'),
+        ]
 
     def __str__(self):
         return f"{self.country} - {self.title}"
@@ -389,6 +456,15 @@ class VisaApplication(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Back-office listing: newest first, optionally filtered
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='visa_app_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='visa_app_status_idx'),
+            models.Index(fields=['visa', '-created_at', '-id'], name='visa_app_visa_idx'),
+            models.Index(fields=['application_type', '-created_at', '-id'], name='visa_app_type_idx'),
+        ]
+
     def __str__(self):
         return f"App for {self.visa.country} ({self.id})"
 
@@ -632,6 +708,28 @@ class VehicleRateCard(models.Model):
     def __str__(self):
         return self.name
 
+class VehicleRoute(models.Model):
+    # Searchable index of VehicleRateCard.routes: one row per priced route and
+    # vehicle column, rebuilt whenever the rate card is saved (see cab_routes.py)
+    rate_card = models.ForeignKey(VehicleRateCard, on_delete=models.CASCADE, related_name='route_index')
+    vehicle = models.ForeignKey(VehicleMaster, on_delete=models.SET_NULL, null=True, blank=True, related_name='routes')
+    vehicle_name = models.CharField(max_length=255, db_index=True)
+    from_key = models.CharField(max_length=255)
+    to_key = models.CharField(max_length=255)
+    pickup_point = models.TextField(blank=True, null=True)
+    drop_point = models.TextField(blank=True, null=True)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    validity_start = models.DateField()
+    validity_end = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['from_key', 'to_key', 'validity_start', 'validity_end'], name='vehicle_route_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.from_key} -> {self.to_key} ({self.vehicle_name})"
+
 class PickupPointMaster(models.Model):
     city = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='pickup_points')
     name = models.CharField(max_length=255)
@@ -691,3 +789,107 @@ class CabAdditionalDocument(models.Model):
 
     def __str__(self):
         return f"Doc for {self.booking.first_name} - {self.document_name or 'unnamed'}"
+
+
+class CollectionVersion(models.Model):
+    # Version stamp per cached API collection, bumped by signals on every write
+    name = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class OutboundEmail(models.Model):
+    # Outbox for emails sent by the send_queued_emails worker (see outbox.py)
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class ImageRendition(models.Model):
+    # Responsive renditions of one stored image, rendered off the request path
+    # by the render_images worker (see renditions.py)
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+
+    source = models.CharField(max_length=255, unique=True)
+    source_model = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    # {"webp": {"320": "renditions/...", ...}, "avif": {...}}
+    renditions = models.JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending job may next be picked up: retry backoff, or the lease of
+    # the worker rendering it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='image_rendition_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    # One file written by ContentAddressedStorage (see storage.py)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class UploadSession(models.Model):
+    # A resumable upload: chunks are staged on disk until it is finalized,
+    # then attached to a document by token (see uploads.py)
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Complete', 'Complete'),
+        ('Attached', 'Attached'),
+    ]
+
+    token = models.CharField(max_length=64, unique=True)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, null=True)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}, {self.status})"
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 6
+# Retry delays double from RETRY_BASE_DELAY up to RETRY_MAX_DELAY
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# How long a claimed batch is left to its worker before others may retry it
+SEND_LEASE = timedelta(minutes=10)
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    # Stores the email for the send_queued_emails worker and returns immediately
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'hello@goimomi.com'),
+        recipients=list(recipients),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def claim_due_emails(batch_size, lease=SEND_LEASE):
+    # Counts an attempt for a batch of due emails and moves next_attempt_at
+    # out by the lease, in one short transaction. Other workers skip the
+    # locked rows and then see them as not due; an email whose worker dies
+    # is picked up again once the lease runs out.
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        leased_until = timezone.now() + lease
+        for email in batch:
+            email.attempts += 1
+            email.next_attempt_at = leased_until
+        OutboundEmail.objects.bulk_update(batch, ['attempts', 'next_attempt_at'])
+    return batch
+
+
+def send_due_emails(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    # Sends one batch of due emails over a single connection. No transaction
+    # or row lock is held while talking to the mail server.
+    # Returns (sent, failed) counts for the batch.
+    batch = claim_due_emails(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        connection_error = None
+    except Exception as e:
+        connection_error = e
+
+    for email in batch:
+        error = connection_error
+        if error is None:
+            try:
+                EmailMessage(
+                    email.subject, email.body, email.from_email, email.recipients,
+                    connection=connection,
+                ).send()
+            except Exception as e:
+                error = e
+
+        now = timezone.now()
+        if error is None:
+            email.status, email.sent_at, email.last_error = 'Sent', now, None
+            sent += 1
+        else:
+            email.last_error = str(error) or error.__class__.__name__
+            if email.attempts >= max_attempts:
+                email.status = 'Failed'
+            else:
+                email.next_attempt_at = now + retry_delay(email.attempts)
+            failed += 1
+
+    if connection_error is None:
+        connection.close()
+    OutboundEmail.objects.bulk_update(batch, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    return sent, failed
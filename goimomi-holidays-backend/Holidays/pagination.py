@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    # Keyset pagination that existing clients can opt into. Requests without
+    # ?cursor= or ?page_size= keep receiving the full, unpaginated list.
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # Views expose their active sort order so the cursor follows it
+        if hasattr(view, 'get_ordering'):
+            return view.get_ordering()
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,200 @@
+import csv
+import io
+import os
+
+from django.db import transaction
+
+from .cab_routes import build_vehicle_lookup, normalize_city, parse_price
+from .caching import bump_collections
+from .city_index import get_city_index
+from .models import VehicleRateCard, VehicleRoute
+
+BATCH_SIZE = 1000
+# Row errors returned in the report; the total is always counted
+MAX_REPORTED_ERRORS = 500
+
+# Sheet headers accepted for the fixed route columns. Every other
+# non-empty header is a vehicle column, in sheet order.
+ROUTE_COLUMNS = {
+    'start_city': 'start_city', 'from_city': 'start_city', 'from': 'start_city',
+    'start_from': 'start_from', 'pickup_point': 'start_from', 'pickup': 'start_from',
+    'drop_city': 'drop_city', 'to_city': 'drop_city', 'to': 'drop_city',
+    'drop_to': 'drop_to', 'drop_point': 'drop_to', 'drop': 'drop_to',
+}
+
+
+class RateCardImportError(Exception):
+    pass
+
+
+def iter_sheet_rows(file, filename):
+    # Yields each row as a list of strings without reading the whole sheet
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            yield from csv.reader(text)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise RateCardImportError(f"Could not read CSV: {e}")
+        finally:
+            text.detach()
+    elif extension in ('.xlsx', '.xlsm'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RateCardImportError("XLSX imports need openpyxl installed")
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as e:
+            raise RateCardImportError(f"Could not read XLSX: {e}")
+        try:
+            sheet = workbook.active
+            if sheet is None:
+                raise RateCardImportError("The workbook has no sheets")
+            for row in sheet.iter_rows(values_only=True):
+                yield ['' if value is None else str(value) for value in row]
+        finally:
+            workbook.close()
+    else:
+        raise RateCardImportError("Unsupported file type, upload a .csv or .xlsx sheet")
+
+
+def parse_header(row):
+    columns, vehicles = {}, []
+    for position, title in enumerate(row):
+        title = (title or '').strip()
+        field = ROUTE_COLUMNS.get('_'.join(title.lower().split()))
+        if field:
+            columns.setdefault(field, position)
+        elif title:
+            vehicles.append((title, position))
+    missing = [field for field in ('start_city', 'drop_city') if field not in columns]
+    if missing:
+        raise RateCardImportError(f"Missing columns: {', '.join(missing)}")
+    if not vehicles:
+        raise RateCardImportError("No vehicle columns found")
+    return columns, vehicles
+
+
+def resolve_city(city_index, value):
+    # Sheet city -> canonical name from master data, or an error message
+    if not value:
+        return None, "City is required"
+    keys = city_index.exact(value)
+    if not keys:
+        return None, f"Unknown city '{value}'"
+    if len(keys) > 1:
+        return None, f"Ambiguous city '{value}'"
+    return city_index.labels[keys.pop()], None
+
+
+def import_rate_card(rate_card, file, filename, dry_run=False):
+    # Replaces the rate card's routes with the rows of an uploaded sheet. Valid
+    # rows are indexed in batches; invalid rows are skipped and reported.
+    rows = iter_sheet_rows(file, filename)
+    try:
+        return _import_rows(rate_card, rows, dry_run)
+    finally:
+        # Release the reader while the caller's file is still open
+        rows.close()
+
+
+def _import_rows(rate_card, rows, dry_run):
+    header = next(rows, None)
+    if header is None:
+        raise RateCardImportError("The sheet is empty")
+    columns, vehicles = parse_header(header)
+    column_vehicles = [title for title, _ in vehicles]
+
+    city_index = get_city_index()
+    vehicle_lookup = build_vehicle_lookup()
+    report = {
+        "rows": 0,
+        "imported": 0,
+        "routes": 0,
+        "error_count": 0,
+        "errors": [],
+        "unknown_vehicles": [title for title in column_vehicles if title.lower() not in vehicle_lookup],
+    }
+    routes, batch = [], []
+
+    def cell(row, position):
+        return row[position].strip() if position is not None and position < len(row) else ''
+
+    def flush():
+        if not dry_run:
+            VehicleRoute.objects.bulk_create(batch)
+        report["routes"] += len(batch)
+        batch.clear()
+
+    with transaction.atomic():
+        if not dry_run:
+            rate_card.route_index.all().delete()
+
+        # Row numbers match the sheet, header included
+        for row_number, row in enumerate(rows, start=2):
+            if not any(value.strip() for value in row):
+                continue
+            report["rows"] += 1
+            errors = []
+
+            start_city, error = resolve_city(city_index, cell(row, columns['start_city']))
+            if error:
+                errors.append(error)
+            drop_city, error = resolve_city(city_index, cell(row, columns['drop_city']))
+            if error:
+                errors.append(error)
+
+            start_from = cell(row, columns.get('start_from'))
+            drop_to = cell(row, columns.get('drop_to'))
+            # One routes entry per sheet row, v1..vN in vehicle column order
+            route = {"start_city": start_city, "start_from": start_from, "drop_city": drop_city, "drop_to": drop_to}
+            prices = []
+            for i, (title, position) in enumerate(vehicles):
+                value = cell(row, position)
+                route[f"v{i + 1}"] = ''
+                if not value:
+                    continue
+                price = parse_price(value)
+                if price is None:
+                    errors.append(f"Invalid price '{value}' for {title}")
+                else:
+                    route[f"v{i + 1}"] = str(price)
+                    prices.append((title, price))
+            if not prices and not errors:
+                errors.append("No prices in row")
+
+            if errors:
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": row_number, "errors": errors})
+                continue
+
+            report["imported"] += 1
+            if not dry_run:
+                routes.append(route)
+            for title, price in prices:
+                batch.append(VehicleRoute(
+                    rate_card=rate_card,
+                    vehicle=vehicle_lookup.get(title.lower()),
+                    vehicle_name=title,
+                    from_key=normalize_city(start_city)[:255],
+                    to_key=normalize_city(drop_city)[:255],
+                    pickup_point=start_from,
+                    drop_point=drop_to,
+                    price=price,
+                    validity_start=rate_card.validity_start,
+                    validity_end=rate_card.validity_end,
+                ))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        if not dry_run:
+            # update() skips the post_save hook that would rebuild the index again
+            VehicleRateCard.objects.filter(pk=rate_card.pk).update(routes=routes, column_vehicles=column_vehicles)
+            rate_card.routes, rate_card.column_vehicles = routes, column_vehicles
+            bump_collections([VehicleRateCard])
+
+    return report
+
@@ -0,0 +1,220 @@
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from rest_framework.fields import get_attribute
+
+from .caching import bump_collections
+from .models import ImageRendition
+
+# Image fields served with responsive renditions, by model label
+RENDITION_SOURCES = {
+    'Holidays.HolidayPackage': ('header_image', 'card_image'),
+    'Holidays.Destination': ('card_image',),
+    'Holidays.Visa': ('card_image',),
+    'Holidays.AccommodationImage': ('image',),
+    'Holidays.SightseeingImage': ('image',),
+    'Holidays.VehicleMaster': ('photo',),
+    'Holidays.Airline': ('logo',),
+}
+RENDITION_WIDTHS = (320, 640, 1024, 1600)
+RENDITION_DIR = 'renditions'
+MAX_ATTEMPTS = 3
+# Failed renders are retried after 5, 10, 20... minutes
+RETRY_BASE_DELAY = timedelta(minutes=5)
+# How long a claimed batch is left to its worker before others may retry it
+RENDER_LEASE = timedelta(minutes=30)
+
+
+def rendition_formats():
+    # WebP always; AVIF when the installed Pillow can encode it
+    Image.init()
+    formats = [('webp', 'WEBP', {'quality': 80, 'method': 4})]
+    if 'AVIF' in Image.SAVE:
+        formats.append(('avif', 'AVIF', {'quality': 60}))
+    return formats
+
+
+def queue_renditions(instance):
+    # Registers the instance's current images for the render_images worker
+    label = instance._meta.label
+    jobs = [
+        ImageRendition(source=file.name, source_model=label)
+        for file in (getattr(instance, name) for name in RENDITION_SOURCES.get(label, ()))
+        if file and file.name
+    ]
+    if jobs:
+        ImageRendition.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+def render_source(name):
+    # Returns {format: {width: stored name}} for one source image
+    stem = os.path.splitext(name)[0]
+    renditions = {}
+    with default_storage.open(name, 'rb') as source, Image.open(source) as original:
+        # Let JPEG decode at a reduced scale that still covers the largest width
+        original.draft(None, (RENDITION_WIDTHS[-1], RENDITION_WIDTHS[-1]))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        widths = [width for width in RENDITION_WIDTHS if width < image.width] or [image.width]
+        for extension, pil_format, options in rendition_formats():
+            renditions[extension] = {}
+            for width in widths:
+                height = max(1, round(image.height * width / image.width))
+                buffer = BytesIO()
+                # Saving without exif= drops the original metadata
+                image.resize((width, height), Image.LANCZOS).save(buffer, pil_format, **options)
+                stored = default_storage.save(
+                    f"{RENDITION_DIR}/{stem}_{width}.{extension}", ContentFile(buffer.getvalue())
+                )
+                renditions[extension][str(width)] = stored
+    return renditions
+
+
+def claim_pending_images(batch_size, lease=RENDER_LEASE):
+    # Counts an attempt for a batch of due jobs and moves next_attempt_at out
+    # by the lease, in one short transaction, so no lock is held while
+    # rendering. A job whose worker dies is picked up again after the lease.
+    with transaction.atomic():
+        batch = list(
+            ImageRendition.objects.select_for_update(skip_locked=True)
+            .filter(status='Pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        leased_until = timezone.now() + lease
+        for job in batch:
+            job.attempts += 1
+            job.next_attempt_at = leased_until
+        ImageRendition.objects.bulk_update(batch, ['attempts', 'next_attempt_at'])
+    return batch
+
+
+def render_pending_images(batch_size=10, max_attempts=MAX_ATTEMPTS):
+    # Renders one batch of due images; several workers can run.
+    # Returns (rendered, failed) counts.
+    batch = claim_pending_images(batch_size)
+    rendered = failed = 0
+    for job in batch:
+        job.updated_at = timezone.now()
+        try:
+            job.renditions = render_source(job.source)
+            job.status, job.last_error = 'Done', None
+            rendered += 1
+        except Exception as e:
+            job.last_error = str(e) or e.__class__.__name__
+            if job.attempts >= max_attempts:
+                job.status = 'Failed'
+            else:
+                job.next_attempt_at = job.updated_at + RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            failed += 1
+    ImageRendition.objects.bulk_update(batch, ['renditions', 'status', 'next_attempt_at', 'last_error', 'updated_at'])
+
+    # Cached API responses embed the srcsets, so drop them for the affected models
+    labels = {job.source_model for job in batch if job.status == 'Done'}
+    bump_collections([apps.get_model(label) for label in sorted(labels)])
+    return rendered, failed
+
+
+def queue_existing_images():
+    # Backfill: registers every image already stored for the configured fields.
+    # Returns the number of records checked.
+    checked = 0
+    for label, fields in RENDITION_SOURCES.items():
+        model = apps.get_model(label)
+        for instance in model.objects.only('pk', *fields).iterator():
+            queue_renditions(instance)
+            checked += 1
+    return checked
+
+
+class SrcsetField(serializers.Field):
+    # {"webp": "<url> 320w, <url> 640w", ...} for an image field, or None
+    # until its renditions have been rendered
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        file = getattr(instance, self.image_field)
+        renditions = self.parent.get_renditions(file.name) if file else None
+        if not renditions:
+            return None
+        request = self.context.get('request')
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if request else url
+
+        return {
+            extension: ", ".join(
+                f"{absolute(default_storage.url(name))} {width}w"
+                for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+            )
+            for extension, sizes in renditions.items()
+        }
+
+
+class RenditionListSerializer(serializers.ListSerializer):
+    # Looks up the renditions of every item, and of the images nested in
+    # them, in one query before rendering
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        load_renditions(self.context, rendition_names(self.child, items))
+        return super().to_representation(items)
+
+
+def rendition_names(serializer, instances):
+    # Image names rendered by the serializer for the instances, following
+    # nested RenditionListSerializer fields (parents should prefetch them)
+    names = {
+        file.name
+        for instance in instances
+        for file in (getattr(instance, field) for field in getattr(serializer, 'rendition_fields', ()))
+        if file
+    }
+    for field in serializer.fields.values():
+        if isinstance(field, RenditionListSerializer) and field.source != '*':
+            nested = []
+            for instance in instances:
+                related = get_attribute(instance, field.source_attrs)
+                nested.extend(related.all() if isinstance(related, models.manager.BaseManager) else related or ())
+            names |= rendition_names(field.child, nested)
+    return names
+
+
+def load_renditions(context, names):
+    # Renditions are kept in the serializer context, which nested serializers
+    # share with their root, so each name is looked up once per response
+    found = context.setdefault('renditions', {})
+    missing = {name for name in names if name not in found}
+    if missing:
+        done = dict(
+            ImageRendition.objects.filter(source__in=missing, status='Done').values_list('source', 'renditions')
+        )
+        found.update({name: done.get(name) for name in missing})
+    return found
+
+
+class RenditionSrcsetMixin:
+    # Adds a "<field>_srcset" entry for each image field in rendition_fields.
+    # Serializers using it set Meta.list_serializer_class = RenditionListSerializer,
+    # and so do serializers nesting them with many=True.
+    rendition_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.rendition_fields:
+            fields[f'{name}_srcset'] = SrcsetField(name)
+        return fields
+
+    def get_renditions(self, name):
+        # Single instances (retrieve, create) fall back to one query
+        return load_renditions(self.context, {name}).get(name)
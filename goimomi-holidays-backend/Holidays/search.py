@@ -0,0 +1,153 @@
+import html
+import re
+from functools import reduce
+from operator import add, and_, or_
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce, Replace
+
+from .models import Destination, HolidayPackage, SightseeingMaster, Visa
+
+SEARCH_CONFIG = 'english'
+# Deepest result reachable by paging; each type is fetched up to here
+MAX_RESULTS = 500
+# Relative weight of each field class in the SQLite fallback ranking
+FALLBACK_WEIGHTS = {'A': 1.0, 'B': 0.4}
+# Same replacements as html.escape, '&' first
+HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
+
+# Searchable collections by result type. The weighted fields must match the
+# GIN indexes created in migration 0122, or PostgreSQL cannot use them.
+# 'visible' limits results to what the public list endpoints show.
+SEARCH_SOURCES = {
+    'package': {
+        'model': HolidayPackage,
+        'visible': HolidayPackage.public_filter,
+        'fields': (('title', 'A'), ('description', 'B')),
+        'title': 'title',
+        'subtitle': 'category',
+        'highlight': 'description',
+    },
+    'destination': {
+        'model': Destination,
+        'visible': Q,
+        'fields': (('name', 'A'), ('country', 'B')),
+        'title': 'name',
+        'subtitle': 'country',
+        'highlight': 'name',
+    },
+    'sightseeing': {
+        'model': SightseeingMaster,
+        'visible': Q,
+        'fields': (('name', 'A'), ('description', 'B')),
+        'title': 'name',
+        'subtitle': 'city',
+        'highlight': 'description',
+    },
+    'visa': {
+        'model': Visa,
+        'visible': Visa.public_filter,
+        'fields': (('title', 'A'), ('country', 'B')),
+        'title': 'title',
+        'subtitle': 'country',
+        'highlight': 'title',
+    },
+}
+
+
+def search_vector(fields):
+    return reduce(add, (SearchVector(field, weight=weight, config=SEARCH_CONFIG) for field, weight in fields))
+
+
+def escaped_text(field):
+    # The column HTML-escaped in SQL, so ts_headline only adds our own <mark> tags
+    expression = Coalesce(field, Value(''))
+    for char, entity in HTML_ESCAPES:
+        expression = Replace(expression, Value(char), Value(entity))
+    return expression
+
+
+def postgres_matches(source, query):
+    # Full-text match served by the GIN index; headlines are computed by
+    # PostgreSQL after the LIMIT, only for the rows returned
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    vector = search_vector(source['fields'])
+    queryset = source['model'].objects.filter(source['visible']()).annotate(document=vector).filter(document=search_query)
+    return queryset, queryset.annotate(
+        rank=SearchRank(vector, search_query),
+        highlight=SearchHeadline(
+            escaped_text(source['highlight']), search_query, config=SEARCH_CONFIG,
+            start_sel='<mark>', stop_sel='</mark>', max_words=35, min_words=15,
+        ),
+    )
+
+
+def fallback_matches(source, query):
+    # icontains on every term for databases without full-text search (SQLite
+    # in development); rank adds the field weights of each matching term
+    terms = query.split()[:10]
+    queryset = source['model'].objects.filter(source['visible']()).filter(reduce(and_, (
+        reduce(or_, (Q(**{f'{field}__icontains': term}) for field, _ in source['fields']))
+        for term in terms
+    )))
+    rank = reduce(add, (
+        Case(
+            When(**{f'{field}__icontains': term}, then=Value(FALLBACK_WEIGHTS[weight])),
+            default=Value(0.0), output_field=FloatField(),
+        )
+        for term in terms
+        for field, weight in source['fields']
+    ))
+    return queryset, queryset.annotate(rank=rank)
+
+
+def highlight_terms(text, query, words=35):
+    # Python counterpart of ts_headline for the fallback; returns escaped HTML
+    terms = [re.escape(term) for term in query.split()[:10]]
+    if not text or not terms:
+        return html.escape(text or '')
+    pattern = re.compile('|'.join(terms), re.IGNORECASE)
+    tokens = text.split()
+    first = next((i for i, token in enumerate(tokens) if pattern.search(token)), 0)
+    start = max(0, first - words // 3)
+    snippet = ' '.join(tokens[start:start + words])
+    parts, last = [], 0
+    for match in pattern.finditer(snippet):
+        parts.append(html.escape(snippet[last:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group(0))}</mark>")
+        last = match.end()
+    parts.append(html.escape(snippet[last:]))
+    return ''.join(parts)
+
+
+def search_catalogue(query, types, offset, limit):
+    # Returns ({type: match count}, results[offset:offset + limit]) merged
+    # across the collections by rank
+    postgres = connection.vendor == 'postgresql'
+    counts, results = {}, []
+    for result_type in types:
+        source = SEARCH_SOURCES[result_type]
+        matches, ranked = (postgres_matches if postgres else fallback_matches)(source, query)
+        counts[result_type] = matches.count()
+        if not counts[result_type] or offset >= MAX_RESULTS:
+            continue
+        columns = ['id', 'rank', source['title'], source['subtitle']]
+        if postgres:
+            columns.append('highlight')
+        elif source['highlight'] not in columns:
+            columns.append(source['highlight'])
+        for row in ranked.order_by('-rank', 'id').values(*columns)[:offset + limit]:
+            results.append({
+                "type": result_type,
+                "id": row['id'],
+                "title": row[source['title']],
+                "subtitle": row[source['subtitle']],
+                "highlight": (
+                    row['highlight'] if postgres else highlight_terms(row[source['highlight']], query)
+                ) or '',
+                "rank": round(row['rank'], 4),
+            })
+    results.sort(key=lambda result: (-result['rank'], result['type'], result['id']))
+    return counts, results[offset:offset + limit]
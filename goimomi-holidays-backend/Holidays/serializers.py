@@ -6,10 +6,12 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 # Django Imports
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.db import transaction
 from django.contrib.auth.models import User
 
 # Local App Imports
+from .renditions import RenditionListSerializer, RenditionSrcsetMixin
 from .models import (
     HolidayEnquiry, UmrahEnquiry, Enquiry, HolidayPackage, PackageDestination,
     ItineraryDay, Inclusion, Exclusion, Highlight, CancellationPolicy,
@@ -19,7 +21,7 @@ from .models import (
     Accommodation, AccommodationImage, Airline, HolidayVehicle,
     SightseeingMaster, SightseeingImage, MealMaster, VehicleBrand,
     RoomType, VehicleMaster, DriverMaster, VehicleRateCard,
-    PickupPointMaster, CabBooking, CabAdditionalDocument
+    PickupPointMaster, CabBooking, CabAdditionalDocument, UploadSession
 )
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -70,15 +72,18 @@ class InclusionSerializer(serializers.ModelSerializer):
         fields = ["text"]
 
 
-class SightseeingImageSerializer(serializers.ModelSerializer):
+class SightseeingImageSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('image',)
     class Meta:
         model = SightseeingImage
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 class SightseeingMasterSerializer(serializers.ModelSerializer):
     images = SightseeingImageSerializer(many=True, read_only=True)
     class Meta:
         model = SightseeingMaster
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 class MealMasterSerializer(serializers.ModelSerializer):
@@ -122,7 +127,8 @@ class ItineraryDaySerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class HolidayPackageSerializer(serializers.ModelSerializer):
+class HolidayPackageSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('header_image', 'card_image')
     itinerary = serializers.SerializerMethodField()
     inclusions = InclusionSerializer(many=True, read_only=True)
     exclusions = ExclusionSerializer(many=True, read_only=True)
@@ -148,6 +154,7 @@ class HolidayPackageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = HolidayPackage
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
     def to_representation(self, instance):
@@ -200,72 +207,69 @@ class HolidayPackageSerializer(serializers.ModelSerializer):
 
 
     def create(self, validated_data):
-        # Handle stringified data from FormData
-        cat_data = validated_data.get('package_categories')
-        if isinstance(cat_data, str):
-            try: validated_data['package_categories'] = json.loads(cat_data)
-            except: validated_data['package_categories'] = []
-            
-        fixed_dep = validated_data.get('fixed_departure')
-        if isinstance(fixed_dep, str):
-            validated_data['fixed_departure'] = fixed_dep.lower() == 'true'
-
-        fixed_data = validated_data.get('fixed_departure_data')
-        if isinstance(fixed_data, str):
-            try: validated_data['fixed_departure_data'] = json.loads(fixed_data)
-            except: validated_data['fixed_departure_data'] = []
+        self._parse_form_fields(validated_data)
 
         # Extract nested data
-        package_destinations_data = validated_data.pop('package_destinations', [])
-        itinerary_days_data = validated_data.pop('itinerary_days', [])
-        inclusions_data = validated_data.pop('inclusions_raw', [])
-        exclusions_data = validated_data.pop('exclusions_raw', [])
-        highlights_data = validated_data.pop('highlights_raw', [])
-        cancellation_policies_data = validated_data.pop('cancellation_policies_raw', [])
-        terms_and_policies_data = validated_data.pop('terms_and_policies_raw', [])
-        vehicles_data = validated_data.pop('vehicles_raw', [])
-        
-        # Create the package
-        package = HolidayPackage.objects.create(**validated_data)
-        
-        self._handle_nested_data(package, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data, accommodations_data=None, terms_and_policies_data=terms_and_policies_data)
+        package_destinations_data = self._ensure_json(validated_data.pop('package_destinations', []))
+        itinerary_days_data = self._ensure_json(validated_data.pop('itinerary_days', []))
+        inclusions_data = self._ensure_json(validated_data.pop('inclusions_raw', []))
+        exclusions_data = self._ensure_json(validated_data.pop('exclusions_raw', []))
+        highlights_data = self._ensure_json(validated_data.pop('highlights_raw', []))
+        cancellation_policies_data = self._ensure_json(validated_data.pop('cancellation_policies_raw', []))
+        terms_and_policies_data = self._ensure_json(validated_data.pop('terms_and_policies_raw', []))
+        vehicles_data = self._ensure_json(validated_data.pop('vehicles_raw', []))
+
+        # Raw data fields are stored on the package itself
+        validated_data.update(
+            inclusions_raw=inclusions_data,
+            exclusions_raw=exclusions_data,
+            highlights_raw=highlights_data,
+            cancellation_policies_raw=cancellation_policies_data,
+            terms_and_policies_raw=terms_and_policies_data,
+            vehicles_raw=vehicles_data,
+        )
+
+        with transaction.atomic():
+            package = HolidayPackage.objects.create(**validated_data)
+            self._handle_nested_data(package, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data)
         return package
 
     def update(self, instance, validated_data):
-        # Handle stringified data from FormData
-        cat_data = validated_data.get('package_categories')
-        if isinstance(cat_data, str):
-            try: validated_data['package_categories'] = json.loads(cat_data)
-            except: validated_data['package_categories'] = []
-            
-        fixed_dep = validated_data.get('fixed_departure')
-        if isinstance(fixed_dep, str):
-            validated_data['fixed_departure'] = fixed_dep.lower() == 'true'
-
-        fixed_data = validated_data.get('fixed_departure_data')
-        if isinstance(fixed_data, str):
-            try: validated_data['fixed_departure_data'] = json.loads(fixed_data)
-            except: validated_data['fixed_departure_data'] = []
+        self._parse_form_fields(validated_data)
 
         # Extract nested data with None as default to detect if they were provided
-        package_destinations_data = validated_data.pop('package_destinations', None)
-        itinerary_days_data = validated_data.pop('itinerary_days', None)
-        inclusions_data = validated_data.pop('inclusions_raw', None)
-        exclusions_data = validated_data.pop('exclusions_raw', None)
-        highlights_data = validated_data.pop('highlights_raw', None)
-        cancellation_policies_data = validated_data.pop('cancellation_policies_raw', None)
-        terms_and_policies_data = validated_data.pop('terms_and_policies_raw', None)
-        accommodations_data = validated_data.pop('accommodations_raw', None)
-        vehicles_data = validated_data.pop('vehicles_raw', None)
+        package_destinations_data = self._ensure_json(validated_data.pop('package_destinations', None))
+        itinerary_days_data = self._ensure_json(validated_data.pop('itinerary_days', None))
+        inclusions_data = self._ensure_json(validated_data.pop('inclusions_raw', None))
+        exclusions_data = self._ensure_json(validated_data.pop('exclusions_raw', None))
+        highlights_data = self._ensure_json(validated_data.pop('highlights_raw', None))
+        cancellation_policies_data = self._ensure_json(validated_data.pop('cancellation_policies_raw', None))
+        terms_and_policies_data = self._ensure_json(validated_data.pop('terms_and_policies_raw', None))
+        accommodations_data = self._ensure_json(validated_data.pop('accommodations_raw', None))
+        vehicles_data = self._ensure_json(validated_data.pop('vehicles_raw', None))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
 
-        # ONLY update nested data if it was explicitly provided in the request
-        # This prevents data loss when updating only basic fields (like is_active)
-        if any(x is not None for x in [package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, cancellation_policies_data, accommodations_data, vehicles_data, terms_and_policies_data]):
-            
+        # Raw data fields are stored on the package itself (only if provided)
+        raw_fields = {
+            'inclusions_raw': inclusions_data,
+            'exclusions_raw': exclusions_data,
+            'highlights_raw': highlights_data,
+            'cancellation_policies_raw': cancellation_policies_data,
+            'terms_and_policies_raw': terms_and_policies_data,
+            'accommodations_raw': accommodations_data,
+            'vehicles_raw': vehicles_data,
+        }
+        for attr, value in raw_fields.items():
+            if value is not None:
+                setattr(instance, attr, value)
+
+        with transaction.atomic():
+            instance.save()
+
+            # ONLY update nested data if it was explicitly provided in the request
+            # This prevents data loss when updating only basic fields (like is_active)
             # Clear existing simple relations ONLY if provided
             if package_destinations_data is not None:
                 instance.extra_destinations.all().delete()
@@ -279,188 +283,252 @@ class HolidayPackageSerializer(serializers.ModelSerializer):
                 instance.cancellation_policies.all().delete()
             if vehicles_data is not None:
                 instance.vehicles.all().delete()
-            # accommodations_raw is stored in the model now, no need to clear separate model
 
             # The _handle_nested_data method already handles itinerary deletion/preservation logic
-            self._handle_nested_data(instance, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data, accommodations_data, terms_and_policies_data=terms_and_policies_data)
+            self._handle_nested_data(instance, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data)
         
         return instance
 
-    def _handle_nested_data(self, package, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data, accommodations_data=None, terms_and_policies_data=None):
+    @staticmethod
+    def _ensure_json(data):
         # Helper to ensure we have a list/dict, but ONLY if not None
-        def ensure_json(data):
-            if data is None: return None
-            if isinstance(data, str):
-                try: return json.loads(data)
-                except: return []
-            return data
-
-        package_destinations_data = ensure_json(package_destinations_data)
-        itinerary_days_data = ensure_json(itinerary_days_data)
-        inclusions_data = ensure_json(inclusions_data)
-        exclusions_data = ensure_json(exclusions_data)
-        highlights_data = ensure_json(highlights_data)
-        cancellation_policies_data = ensure_json(cancellation_policies_data)
-        vehicles_data = ensure_json(vehicles_data)
-        accommodations_data = ensure_json(accommodations_data)
-        terms_and_policies_data = ensure_json(terms_and_policies_data)
+        if data is None: return None
+        if isinstance(data, str):
+            try: return json.loads(data)
+            except: return []
+        return data
+
+    @staticmethod
+    def _parse_form_fields(validated_data):
+        # Handle stringified data from FormData
+        cat_data = validated_data.get('package_categories')
+        if isinstance(cat_data, str):
+            try: validated_data['package_categories'] = json.loads(cat_data)
+            except: validated_data['package_categories'] = []
+            
+        fixed_dep = validated_data.get('fixed_departure')
+        if isinstance(fixed_dep, str):
+            validated_data['fixed_departure'] = fixed_dep.lower() == 'true'
+
+        fixed_data = validated_data.get('fixed_departure_data')
+        if isinstance(fixed_data, str):
+            try: validated_data['fixed_departure_data'] = json.loads(fixed_data)
+            except: validated_data['fixed_departure_data'] = []
+
+    def _handle_nested_data(self, package, package_destinations_data, itinerary_days_data, inclusions_data, exclusions_data, highlights_data, vehicles_data, cancellation_policies_data):
+        # Resolve every destination name used below in a single query
+        dest_names = set()
+        if isinstance(package_destinations_data, list):
+            for dest_data in package_destinations_data:
+                if isinstance(dest_data, dict) and dest_data.get('destination'):
+                    dest_names.add(dest_data['destination'])
+                elif isinstance(dest_data, str):
+                    dest_names.add(dest_data)
+        destinations_by_name = {}
+        if dest_names:
+            for dest in Destination.objects.filter(name__in=dest_names).order_by('id'):
+                destinations_by_name.setdefault(dest.name, dest)
 
         # 1. Package Destinations (only if provided)
         if package_destinations_data is not None and isinstance(package_destinations_data, list):
+            package_destinations = []
             for dest_data in package_destinations_data:
                 if isinstance(dest_data, dict) and dest_data.get('destination'):
-                    dest_obj = Destination.objects.filter(name=dest_data.get('destination')).first()
+                    dest_obj = destinations_by_name.get(dest_data.get('destination'))
                     if dest_obj:
-                        PackageDestination.objects.create(
+                        package_destinations.append(PackageDestination(
                             package=package,
                             destination=dest_obj,
-                            nights=int(dest_data.get('nights', 1)) if isinstance(dest_data, dict) else 1
-                        )
+                            nights=int(dest_data.get('nights', 1))
+                        ))
+            PackageDestination.objects.bulk_create(package_destinations)
 
         # 2. Itinerary Days (only if provided)
         if itinerary_days_data is not None:
-            request = self.context.get('request')
-            primary_dest = None
-            
-            # Get primary destination from input or existing if input missing destinations
-            if package_destinations_data and len(package_destinations_data) > 0:
-                first_dest = package_destinations_data[0]
-                dest_name = first_dest.get('destination') if isinstance(first_dest, dict) else first_dest
-                primary_dest = Destination.objects.filter(name=dest_name).first()
-            if not primary_dest:
-                p_dest_obj = package.extra_destinations.first()
-                if p_dest_obj: primary_dest = p_dest_obj.destination
-
-            # Capture existing itinerary days to preserve images
-            existing_days = {d.day_number: d for d in package.itinerary.all()}
-            # We will delete them but keep references to their image files
-            package.itinerary.all().delete()
-
-            current_day_num = 0
-            for i, day_data in enumerate(itinerary_days_data):
-                title = day_data.get('title', '').strip()
-                # Relaxed title check - allow empty titles if description exists
-                if not title and not day_data.get('description'): continue
-
-                current_day_num += 1
-                day_num = current_day_num
-
-                # Handle Image
-                image_file = None
-                if request and request.FILES:
-                    image_file = request.FILES.get(f'itinerary_image_{i}')
-
-                # Master Template logic
-                master_template_obj = None
-                master_id = day_data.get('master_template')
-                if master_id:
-                    master_template_obj = ItineraryMaster.objects.filter(id=master_id).first()
-
-                if master_template_obj:
-                    # Update existing master
-                    master_template_obj.title = title[:200]
-                    master_template_obj.description = day_data.get('description', '')
-                    master_template_obj.details_json = day_data.get('details_json', {})
-                    if image_file:
-                        try:
-                            if hasattr(image_file, 'open'): image_file.open()
-                            file_content = image_file.read()
-                            master_template_obj.image.save(image_file.name, ContentFile(file_content), save=False)
-                            image_file.seek(0)
-                        except: pass
-                    master_template_obj.save()
-                else:
-                    # Create NEW master
-                    try:
-                        master_image = None
-                        if image_file:
-                            try:
-                                if hasattr(image_file, 'open'): image_file.open()
-                                file_content = image_file.read()
-                                master_image = ContentFile(file_content, name=image_file.name)
-                                image_file.seek(0)
-                            except: pass
-                        
-                        master_template_obj = ItineraryMaster.objects.create(
-                            destination=primary_dest,
-                            name=title[:200],
-                            title=title[:200],
-                            description=day_data.get('description', ''),
-                            details_json=day_data.get('details_json', {}),
-                            image=master_image
-                        )
-                    except Exception:
-                        pass
-
-                # Preserve old image if no new one uploaded
-                if not image_file and day_num in existing_days:
-                    image_file = existing_days[day_num].image
-
-                ItineraryDay.objects.create(
-                    package=package,
-                    day_number=day_num,
-                    title=title,
-                    description=day_data.get('description', ''),
-                    details_json=day_data.get('details_json', {}),
-                    master_template=master_template_obj,
-                    image=image_file or (master_template_obj.image if master_template_obj else None)
-                )
+            self._sync_itinerary(package, itinerary_days_data, package_destinations_data, destinations_by_name)
 
         # 3. Simple list fields (only if provided)
         if inclusions_data is not None:
-            for text in inclusions_data:
-                if text: Inclusion.objects.create(package=package, text=text)
+            Inclusion.objects.bulk_create([Inclusion(package=package, text=text) for text in inclusions_data if text])
         if exclusions_data is not None:
-            for text in exclusions_data:
-                if text: Exclusion.objects.create(package=package, text=text)
+            Exclusion.objects.bulk_create([Exclusion(package=package, text=text) for text in exclusions_data if text])
         if highlights_data is not None:
-            for text in highlights_data:
-                if text: Highlight.objects.create(package=package, text=text)
-
+            Highlight.objects.bulk_create([Highlight(package=package, text=text) for text in highlights_data if text])
         if cancellation_policies_data is not None:
-            for text in cancellation_policies_data:
-                if text: CancellationPolicy.objects.create(package=package, text=text)
+            CancellationPolicy.objects.bulk_create([CancellationPolicy(package=package, text=text) for text in cancellation_policies_data if text])
 
         # 4. Detailed Vehicles (only if provided)
         if vehicles_data is not None:
-            for v in vehicles_data:
-                if isinstance(v, dict):
-                    HolidayVehicle.objects.create(
-                        package=package,
-                        category=v.get('category', ''),
-                        vehicle_type=v.get('vehicle_type', ''),
-                        no_of_vehicles=v.get('no_of_vehicles', 1),
-                        pickup_date=v.get('pickup_date') or None,
-                        pickup_location=v.get('pickup_location', ''),
-                        dropoff_date=v.get('dropoff_date') or None,
-                        dropoff_location=v.get('dropoff_location', ''),
-                        vehicle_brand=v.get('vehicle_brand', ''),
-                        pickup_time=v.get('pickup_time') or None,
-                        dropoff_time=v.get('dropoff_time') or None,
-                        remarks=v.get('remarks', '')
-                    )
-
-        # 5. Save Raw Data Fields to Model
-        if inclusions_data is not None:
-            package.inclusions_raw = inclusions_data
-        if exclusions_data is not None:
-            package.exclusions_raw = exclusions_data
-        if highlights_data is not None:
-            package.highlights_raw = highlights_data
-        if cancellation_policies_data is not None:
-            package.cancellation_policies_raw = cancellation_policies_data
-        if vehicles_data is not None:
-            package.vehicles_raw = vehicles_data
-        if accommodations_data is not None:
-            package.accommodations_raw = accommodations_data
-        if terms_and_policies_data is not None:
-            package.terms_and_policies_raw = terms_and_policies_data
+            HolidayVehicle.objects.bulk_create([
+                HolidayVehicle(
+                    package=package,
+                    category=v.get('category', ''),
+                    vehicle_type=v.get('vehicle_type', ''),
+                    no_of_vehicles=v.get('no_of_vehicles', 1),
+                    pickup_date=v.get('pickup_date') or None,
+                    pickup_location=v.get('pickup_location', ''),
+                    dropoff_date=v.get('dropoff_date') or None,
+                    dropoff_location=v.get('dropoff_location', ''),
+                    vehicle_brand=v.get('vehicle_brand', ''),
+                    pickup_time=v.get('pickup_time') or None,
+                    dropoff_time=v.get('dropoff_time') or None,
+                    remarks=v.get('remarks', '')
+                )
+                for v in vehicles_data if isinstance(v, dict)
+            ])
+
+    def _sync_itinerary(self, package, itinerary_days_data, package_destinations_data, destinations_by_name):
+        # Existing days are matched by id (or day number) and only changed fields are written.
+        # Uploaded images are stored once on the master template and the day references that file.
+        request = self.context.get('request')
+        primary_dest = None
         
-        package.save()
+        # Get primary destination from input or existing if input missing destinations
+        if package_destinations_data and len(package_destinations_data) > 0:
+            first_dest = package_destinations_data[0]
+            dest_name = first_dest.get('destination') if isinstance(first_dest, dict) else first_dest
+            primary_dest = destinations_by_name.get(dest_name)
+        if not primary_dest:
+            p_dest_obj = package.extra_destinations.select_related('destination').first()
+            if p_dest_obj: primary_dest = p_dest_obj.destination
+
+        existing_days = list(package.itinerary.all())
+        existing_by_id = {d.id: d for d in existing_days}
+        referenced_ids = set()
+        for day_data in itinerary_days_data:
+            try: referenced_ids.add(int(day_data.get('id')))
+            except (TypeError, ValueError): pass
+        # Days not claimed by id can still be matched by their day number
+        existing_by_number = {d.day_number: d for d in existing_days if d.id not in referenced_ids}
+
+        # Load all referenced master templates at once
+        master_ids = {d.master_template_id for d in existing_days if d.master_template_id}
+        for day_data in itinerary_days_data:
+            try: master_ids.add(int(day_data.get('master_template')))
+            except (TypeError, ValueError): pass
+        masters_by_id = ItineraryMaster.objects.in_bulk(master_ids) if master_ids else {}
+
+        plan = []
+        claimed = set()
+        master_changes = {}
+        new_masters = []
+        current_day_num = 0
+        for i, day_data in enumerate(itinerary_days_data):
+            title = day_data.get('title', '').strip()
+            # Relaxed title check - allow empty titles if description exists
+            if not title and not day_data.get('description'): continue
+
+            current_day_num += 1
+            description = day_data.get('description', '')
+            details_json = day_data.get('details_json', {})
+
+            day = None
+            try: day = existing_by_id.get(int(day_data.get('id')))
+            except (TypeError, ValueError): pass
+            if day is None:
+                day = existing_by_number.get(current_day_num)
+            if day is not None and day.id in claimed:
+                day = None
+            if day is not None:
+                claimed.add(day.id)
+
+            # Handle Image
+            image_file = None
+            if request and request.FILES:
+                image_file = request.FILES.get(f'itinerary_image_{i}')
+
+            # Master Template logic: only a template referenced by id is edited
+            master_template_obj = None
+            try: master_template_obj = masters_by_id.get(int(day_data.get('master_template')))
+            except (TypeError, ValueError): pass
+            linked_master = masters_by_id.get(day.master_template_id) if day is not None else None
+
+            if master_template_obj is None and linked_master is not None and not image_file:
+                # Templates are shared between packages, so keep the day's link as is
+                master_template_obj = linked_master
+            elif master_template_obj:
+                # Update existing master
+                changed = master_changes.setdefault(master_template_obj, set())
+                for attr, value in (('title', title[:200]), ('description', description), ('details_json', details_json)):
+                    if getattr(master_template_obj, attr) != value:
+                        setattr(master_template_obj, attr, value)
+                        changed.add(attr)
+                if image_file:
+                    master_template_obj.image.save(image_file.name, image_file, save=False)
+                    changed.add('image')
+            else:
+                # Create NEW master
+                master_template_obj = ItineraryMaster(
+                    destination=primary_dest,
+                    name=title[:200],
+                    title=title[:200],
+                    description=description,
+                    details_json=details_json,
+                    image=image_file
+                )
+                new_masters.append(master_template_obj)
+
+            plan.append((day, master_template_obj, bool(image_file), {
+                'day_number': current_day_num,
+                'title': title,
+                'description': description,
+                'details_json': details_json,
+            }))
+
+        self._bulk_update_changed(ItineraryMaster, master_changes)
+        ItineraryMaster.objects.bulk_create(new_masters)
+
+        day_changes = {}
+        new_days = []
+        for day, master, uploaded, values in plan:
+            values['master_template_id'] = master.id
+            master_image = master.image.name if master.image else ''
+            if uploaded or day is None or not day.image:
+                values['image'] = master_image
+            if day is None:
+                new_days.append(ItineraryDay(package=package, **values))
+                continue
+            changed = day_changes.setdefault(day, set())
+            for attr, value in values.items():
+                if attr == 'image':
+                    if (day.image.name or '') == value: continue
+                elif getattr(day, attr) == value: continue
+                setattr(day, attr, value)
+                changed.add(attr)
+
+        stale_ids = [d.id for d in existing_days if d.id not in claimed]
+        if stale_ids:
+            ItineraryDay.objects.filter(id__in=stale_ids).delete()
+        self._bulk_update_changed(ItineraryDay, day_changes)
+        ItineraryDay.objects.bulk_create(new_days)
+
+    @staticmethod
+    def _bulk_update_changed(model, changes):
+        # One UPDATE per distinct set of changed fields; untouched rows are skipped
+        groups = {}
+        for obj, fields in changes.items():
+            if fields:
+                groups.setdefault(frozenset(fields), []).append(obj)
+        for fields, objs in groups.items():
+            model.objects.bulk_update(objs, sorted(fields))
+
+
+# Slim projection for the package listing cards (/api/packages/?view=card)
+class HolidayPackageCardSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('card_image',)
+    nights = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = HolidayPackage
+        list_serializer_class = RenditionListSerializer
+        fields = ["id", "title", "card_image", "Offer_price", "price", "days", "nights", "category", "starting_city"]
+
 
-class DestinationSerializer(serializers.ModelSerializer):
+class DestinationSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('card_image',)
     class Meta:
         model = Destination
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 
@@ -514,12 +582,14 @@ class CountrySerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class VisaSerializer(serializers.ModelSerializer):
+class VisaSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('card_image',)
     country_details = serializers.SerializerMethodField()
     supplier_details = serializers.SerializerMethodField()
 
     class Meta:
         model = Visa
+        list_serializer_class = RenditionListSerializer
         fields = [
             'id', 'country', 'title', 'entry_type', 'validity', 'duration', 
             'processing_time', 'cost_price', 'service_charge', 'selling_price', 
@@ -530,7 +600,11 @@ class VisaSerializer(serializers.ModelSerializer):
 
     def get_country_details(self, obj):
         try:
-            country = Country.objects.filter(name=obj.country).first()
+            countries_by_name = self.context.get('countries_by_name')
+            if countries_by_name is not None:
+                country = countries_by_name.get(obj.country)
+            else:
+                country = Country.objects.filter(name=obj.country).first()
             if country:
                 return CountrySerializer(country).data
         except Exception:
@@ -582,6 +656,21 @@ class VisaApplicationSerializer(serializers.ModelSerializer):
         ]
 
 
+# Back-office list rows (?view=summary): no nested applicants or documents
+class VisaApplicationSummarySerializer(serializers.ModelSerializer):
+    visa_country = serializers.CharField(source='visa.country', read_only=True)
+    visa_title = serializers.CharField(source='visa.title', read_only=True)
+    applicant_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = VisaApplication
+        fields = [
+            'id', 'visa', 'application_type', 'internal_id', 'group_name',
+            'departure_date', 'return_date', 'total_price', 'status',
+            'created_at', 'visa_country', 'visa_title', 'applicant_count'
+        ]
+
+
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -598,9 +687,11 @@ class HotelMasterSerializer(serializers.ModelSerializer):
         model = HotelMaster
         fields = "__all__"
 
-class AirlineSerializer(serializers.ModelSerializer):
+class AirlineSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('logo',)
     class Meta:
         model = Airline
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 class VehicleBrandSerializer(serializers.ModelSerializer):
@@ -608,15 +699,18 @@ class VehicleBrandSerializer(serializers.ModelSerializer):
         model = VehicleBrand
         fields = "__all__"
 
-class AccommodationImageSerializer(serializers.ModelSerializer):
+class AccommodationImageSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('image',)
     class Meta:
         model = AccommodationImage
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 class AccommodationSerializer(serializers.ModelSerializer):
     images = AccommodationImageSerializer(many=True, read_only=True)
     class Meta:
         model = Accommodation
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
 class RoomTypeSerializer(serializers.ModelSerializer):
@@ -624,22 +718,30 @@ class RoomTypeSerializer(serializers.ModelSerializer):
         model = RoomType
         fields = "__all__"
 
-class VehicleMasterSerializer(serializers.ModelSerializer):
+class VehicleMasterSerializer(RenditionSrcsetMixin, serializers.ModelSerializer):
+    rendition_fields = ('photo',)
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     driver_name = serializers.CharField(source='driver.name', read_only=True)
     latest_rate_card_file = serializers.SerializerMethodField()
     class Meta:
         model = VehicleMaster
+        list_serializer_class = RenditionListSerializer
         fields = "__all__"
 
     def get_latest_rate_card_file(self, obj):
-        latest_card = obj.rate_cards.order_by('-created_at').first()
-        if latest_card and latest_card.rate_card_file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(latest_card.rate_card_file.url)
-            return latest_card.rate_card_file.url
-        return None
+        # VehicleMasterViewSet annotates the file name; fall back to a query otherwise
+        if hasattr(obj, 'latest_rate_card_file_name'):
+            name = obj.latest_rate_card_file_name
+        else:
+            latest_card = obj.rate_cards.order_by('-created_at', '-id').first()
+            name = latest_card.rate_card_file.name if latest_card else None
+        if not name:
+            return None
+        url = VehicleRateCard._meta.get_field('rate_card_file').storage.url(name)
+        request = self.context.get('request')
+        if request:
+            return request.build_absolute_uri(url)
+        return url
 
 class DriverMasterSerializer(serializers.ModelSerializer):
     class Meta:
@@ -666,3 +768,24 @@ class CabBookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = CabBooking
         fields = "__all__"
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['token', 'filename', 'content_type', 'size', 'received', 'checksum', 'status', 'created_at']
+        read_only_fields = ['token', 'received', 'checksum', 'status', 'created_at']
+
+    def validate_filename(self, value):
+        # Only the base name is kept; storage picks the directory
+        value = value.replace('\\', '/').rsplit('/', 1)[-1].strip()
+        if not value:
+            raise serializers.ValidationError("A file name is required.")
+        return value
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Size must be positive.")
+        if value > settings.UPLOAD_SESSION_MAX_SIZE:
+            raise serializers.ValidationError(f"Files are limited to {settings.UPLOAD_SESSION_MAX_SIZE} bytes.")
+        return value
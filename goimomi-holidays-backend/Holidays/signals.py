@@ -0,0 +1,78 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .cab_routes import rebuild_routes, relink_route_vehicles
+from .caching import bump_collections
+from .renditions import RENDITION_SOURCES, queue_renditions
+from .models import (
+    Airline, CancellationPolicy, Country, CruiseCalendar, Destination,
+    Exclusion, Highlight, HolidayPackage, HolidayVehicle, Inclusion,
+    ItineraryDay, Nationality, PackageDestination, PickupPointMaster, RoomType,
+    StartingCity, Supplier, UmrahDestination, VehicleBrand, VehicleMaster,
+    VehicleRateCard, Visa
+)
+
+
+# Route index receivers are connected first so the route table is up to date
+# before the collection versions below are bumped
+def rebuild_rate_card_routes(sender, instance, **kwargs):
+    rebuild_routes(instance)
+
+
+post_save.connect(rebuild_rate_card_routes, sender=VehicleRateCard, dispatch_uid='rate-card-routes')
+
+
+def relink_routes(sender, **kwargs):
+    relink_route_vehicles()
+
+
+for model in (VehicleMaster, VehicleBrand):
+    post_save.connect(relink_routes, sender=model, dispatch_uid=f'route-vehicles-save-{model.__name__}')
+    post_delete.connect(relink_routes, sender=model, dispatch_uid=f'route-vehicles-delete-{model.__name__}')
+
+
+# Cached collections to invalidate when a model is written
+COLLECTION_DEPENDENCIES = {
+    HolidayPackage: [HolidayPackage],
+    PackageDestination: [HolidayPackage],
+    ItineraryDay: [HolidayPackage],
+    Inclusion: [HolidayPackage],
+    Exclusion: [HolidayPackage],
+    Highlight: [HolidayPackage],
+    CancellationPolicy: [HolidayPackage],
+    HolidayVehicle: [HolidayPackage],
+    # Packages render destination names
+    Destination: [Destination, HolidayPackage],
+    Visa: [Visa],
+    # Visas render country and supplier details
+    Country: [Country, Visa],
+    Supplier: [Visa],
+    CruiseCalendar: [CruiseCalendar],
+    StartingCity: [StartingCity],
+    Nationality: [Nationality],
+    UmrahDestination: [UmrahDestination],
+    Airline: [Airline],
+    RoomType: [RoomType],
+    # Cab search results and city index (CabSearchAPI, city_index.py)
+    VehicleBrand: [VehicleBrand],
+    VehicleMaster: [VehicleMaster],
+    VehicleRateCard: [VehicleRateCard],
+    PickupPointMaster: [PickupPointMaster],
+}
+
+
+def bump_dependent_collections(sender, **kwargs):
+    bump_collections(COLLECTION_DEPENDENCIES[sender])
+
+
+for model in COLLECTION_DEPENDENCIES:
+    post_save.connect(bump_dependent_collections, sender=model, dispatch_uid=f'collection-save-{model.__name__}')
+    post_delete.connect(bump_dependent_collections, sender=model, dispatch_uid=f'collection-delete-{model.__name__}')
+
+
+def queue_image_renditions(sender, instance, **kwargs):
+    queue_renditions(instance)
+
+
+for label in RENDITION_SOURCES:
+    post_save.connect(queue_image_renditions, sender=apps.get_model(label), dispatch_uid=f'renditions-{label}')
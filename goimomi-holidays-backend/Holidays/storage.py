@@ -0,0 +1,90 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+CAS_DIR = 'cas'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Stores every upload once, under the SHA-256 of its content:
+    # cas/ab/cd/abcd...<ext>. Identical uploads share a file, and a name never
+    # changes content, so its URL can be cached forever. MediaBlob counts the
+    # saves of each blob; gc_media_blobs reconciles the counts and deletes
+    # unreferenced blobs. Names written by other storages keep working.
+
+    def _save(self, name, content):
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        name = f"{CAS_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+        # Reference first, then make sure the file exists: gc_media_blobs only
+        # removes blobs whose row has not been touched for a while
+        self.add_reference(name, content.size)
+        full_path = self.path(name)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Write under a unique temporary name, then rename into place.
+            # Concurrent uploads of the same content write identical bytes,
+            # so whichever rename lands last is equally correct.
+            temp_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+            if hasattr(content, 'temporary_file_path'):
+                file_move_safe(content.temporary_file_path(), temp_path)
+            else:
+                content.seek(0)
+                with open(temp_path, 'wb') as f:
+                    for chunk in content.chunks():
+                        f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content hash in _save
+        return name
+
+    def delete(self, name):
+        # Drops one reference; gc_media_blobs removes the file once nothing
+        # references it. Files saved before this storage are deleted as usual.
+        if name and name.startswith(f"{CAS_DIR}/"):
+            from .models import MediaBlob
+            MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+                refcount=F('refcount') - 1, updated_at=timezone.now()
+            )
+            return
+        super().delete(name)
+
+    @staticmethod
+    def add_reference(name, size):
+        from .models import MediaBlob
+        now = timezone.now()
+        if MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now):
+            return
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, size=size or 0, refcount=1)
+        except IntegrityError:
+            MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=now)
+
+    def purge(self, blob):
+        # Deletes an unreferenced blob unless an upload touched it since
+        # it was read; returns whether it was deleted
+        from .models import MediaBlob
+        with transaction.atomic():
+            locked = MediaBlob.objects.select_for_update().filter(
+                pk=blob.pk, refcount=0, updated_at=blob.updated_at
+            ).first()
+            if locked is None:
+                return False
+            super().delete(blob.name)
+            locked.delete()
+        return True
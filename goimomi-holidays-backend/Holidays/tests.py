@@ -0,0 +1,607 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO, StringIO
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .models import (
+    Accommodation, AccommodationImage, CabAdditionalDocument, CabBooking, CancellationPolicy, Destination, Exclusion, Highlight, HolidayPackage,
+    DriverMaster, HolidayVehicle, MediaBlob, OutboundEmail, UploadSession, Inclusion, ItineraryDay, ItineraryMaster, ImageRendition,
+    PackageDestination, SightseeingImage, SightseeingMaster, StartingCity, Supplier, VehicleBrand, VehicleMaster, VehicleRateCard, Visa
+)
+from .outbox import MAX_ATTEMPTS, claim_due_emails, queue_email, send_due_emails
+from .renditions import claim_pending_images, render_pending_images
+from .storage import ContentAddressedStorage
+
+
+def create_package(index, **fields):
+    supplier = Supplier.objects.create(
+        company_name=f"Supplier {index}", address_line1="Street", city="Delhi", state="Delhi",
+        country="India", contact_no="1", contact_person="Agent",
+    )
+    package = HolidayPackage.objects.create(
+        title=f"Package {index}", starting_city="Delhi", days=4, Offer_price=1000, price=1200,
+        supplier=supplier, **fields
+    )
+    destination = Destination.objects.create(name=f"Destination {index}", country="India")
+    PackageDestination.objects.create(package=package, destination=destination, nights=3)
+    ItineraryDay.objects.create(package=package, day_number=1, title="Arrival", description="Check in")
+    Inclusion.objects.create(package=package, text="Breakfast")
+    Exclusion.objects.create(package=package, text="Flights")
+    Highlight.objects.create(package=package, text="City tour")
+    CancellationPolicy.objects.create(package=package, text="No refunds")
+    HolidayVehicle.objects.create(package=package, category="Self Drive", vehicle_type="SUV")
+    return package
+
+
+def count_queries(client, url, params):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params)
+    return response, len(queries)
+
+
+class PackageListQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for index in range(6):
+            create_package(index)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        small, small_queries = count_queries(self.client, '/api/packages/', {'page_size': 2})
+        large, large_queries = count_queries(self.client, '/api/packages/', {'page_size': 6})
+        self.assertEqual(len(small.data['results']), 2)
+        self.assertEqual(len(large.data['results']), 6)
+        self.assertEqual(small_queries, large_queries)
+
+
+class ItinerarySyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.master = ItineraryMaster.objects.create(name="Arrival", title="Arrival", description="Shared day")
+        self.package = create_package(1)
+        self.other = create_package(2)
+        for package in (self.package, self.other):
+            package.itinerary.update(master_template=self.master)
+
+    def update_itinerary(self, days):
+        response = self.client.patch(f'/api/packages/{self.package.id}/', {'itinerary_days': days}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_shared_master_is_not_edited_without_its_id(self):
+        day = self.package.itinerary.get()
+        self.update_itinerary([{'id': day.id, 'title': "Late arrival", 'description': "Edited here"}])
+
+        self.master.refresh_from_db()
+        self.assertEqual((self.master.title, self.master.description), ("Arrival", "Shared day"))
+        day.refresh_from_db()
+        self.assertEqual((day.title, day.master_template_id), ("Late arrival", self.master.id))
+
+    def test_master_is_edited_when_referenced(self):
+        day = self.package.itinerary.get()
+        self.update_itinerary([{'id': day.id, 'master_template': self.master.id, 'title': "Arrival", 'description': "Updated"}])
+
+        self.master.refresh_from_db()
+        self.assertEqual(self.master.description, "Updated")
+
+
+class RateCardRouteIndexTests(TestCase):
+    def test_unusable_prices_are_left_out_of_the_index(self):
+        brand, _ = VehicleBrand.objects.get_or_create(name="Toyota")
+        VehicleMaster.objects.create(name="Camry", brand=brand, seating_capacity=4, luggage_capacity=2)
+        rate_card = VehicleRateCard.objects.create(
+            name="UAE", country="UAE", validity_start=date(2026, 1, 1), validity_end=date(2026, 12, 31),
+            routes=[], column_vehicles=["Camry"],
+        )
+        routes = [
+            {"start_city": "Dubai", "drop_city": "Sharjah", "v1": price}
+            for price in ("NaN", "Infinity", "1e30", "0", "-5", "120.5")
+        ]
+
+        response = APIClient().patch(f'/api/vehicle-rate-cards/{rate_card.id}/', {'routes': routes}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([str(price) for price in rate_card.route_index.values_list('price', flat=True)], ["120.50"])
+
+    def test_cab_search_sends_prices_as_strings(self):
+        StartingCity.objects.create(name="Dubai")
+        StartingCity.objects.create(name="Sharjah")
+        brand, _ = VehicleBrand.objects.get_or_create(name="Toyota")
+        VehicleMaster.objects.create(name="Camry", brand=brand, seating_capacity=4, luggage_capacity=2)
+        VehicleRateCard.objects.create(
+            name="UAE", country="UAE", validity_start=date(2026, 1, 1), validity_end=date(2026, 12, 31),
+            routes=[{"start_city": "Dubai", "drop_city": "Sharjah", "v1": "1,200"}], column_vehicles=["Camry"],
+        )
+
+        response = APIClient().get('/api/cab-search/', {'from_city': "Dubai", 'to_city': "Sharjah", 'pickup_date': "2026-05-01"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([option['price'] for option in response.json()], ["1200.00"])
+
+
+class RateCardImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        StartingCity.objects.create(name="Dubai")
+        StartingCity.objects.create(name="Abu Dhabi")
+        self.rate_card = VehicleRateCard.objects.create(
+            name="UAE", country="UAE", validity_start=date(2026, 1, 1), validity_end=date(2026, 12, 31),
+            routes=[{"start_city": "Dubai", "drop_city": "Abu Dhabi", "v1": "100"}], column_vehicles=["Sedan"],
+        )
+        self.rate_card.rate_card_file.save("current.csv", ContentFile(b"start_city,drop_city,Sedan\n"))
+        self.current_file = self.rate_card.rate_card_file.name
+        self.addCleanup(self.rate_card.rate_card_file.storage.delete, self.current_file)
+
+    def post_sheet(self, content):
+        sheet = SimpleUploadedFile("rates.csv", content, content_type="text/csv")
+        return self.client.post(f'/api/vehicle-rate-cards/{self.rate_card.id}/import/', {'file': sheet})
+
+    def test_rejected_sheet_keeps_file_and_routes(self):
+        response = self.post_sheet(b"from,Sedan\nDubai,120\n")
+
+        self.assertEqual(response.status_code, 400)
+        self.rate_card.refresh_from_db()
+        self.assertEqual(self.rate_card.rate_card_file.name, self.current_file)
+        self.assertEqual(self.rate_card.route_index.count(), 1)
+
+    def test_imported_sheet_replaces_file_and_routes(self):
+        response = self.post_sheet(b"start_city,drop_city,Sedan,SUV\nDubai,Abu Dhabi,120,\nAbu Dhabi,Dubai,1 000,250\n")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['error_count'], 1)
+        self.rate_card.refresh_from_db()
+        self.addCleanup(self.rate_card.rate_card_file.delete, save=False)
+        self.assertNotEqual(self.rate_card.rate_card_file.name, self.current_file)
+        self.assertEqual(self.rate_card.routes, [
+            {"start_city": "Dubai", "start_from": "", "drop_city": "Abu Dhabi", "drop_to": "", "v1": "120.00", "v2": ""},
+        ])
+        self.assertEqual(self.rate_card.route_index.count(), 1)
+
+    def test_routes_keep_one_entry_per_sheet_row(self):
+        response = self.post_sheet(
+            b"start_city,drop_city,pickup,Sedan,SUV\n"
+            b"Dubai,Abu Dhabi,Mall,120,\n"
+            b"Dubai,Abu Dhabi,Mall,,310\n"
+            b"Abu Dhabi,Dubai,,130,\n"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.rate_card.refresh_from_db()
+        self.addCleanup(self.rate_card.rate_card_file.delete, save=False)
+        self.assertEqual(self.rate_card.routes, [
+            {"start_city": "Dubai", "start_from": "Mall", "drop_city": "Abu Dhabi", "drop_to": "", "v1": "120.00", "v2": ""},
+            {"start_city": "Dubai", "start_from": "Mall", "drop_city": "Abu Dhabi", "drop_to": "", "v1": "", "v2": "310.00"},
+            {"start_city": "Abu Dhabi", "start_from": "", "drop_city": "Dubai", "drop_to": "", "v1": "130.00", "v2": ""},
+        ])
+
+    def test_duplicate_vehicle_columns_keep_their_prices(self):
+        response = self.post_sheet(b"start_city,drop_city,Sedan,Sedan\nDubai,Abu Dhabi,120,140\n")
+
+        self.assertEqual(response.status_code, 200)
+        self.rate_card.refresh_from_db()
+        self.addCleanup(self.rate_card.rate_card_file.delete, save=False)
+        self.assertEqual(self.rate_card.column_vehicles, ["Sedan", "Sedan"])
+        self.assertEqual(self.rate_card.routes[0]["v1"], "120.00")
+        self.assertEqual(self.rate_card.routes[0]["v2"], "140.00")
+
+    def test_unusable_prices_are_row_errors(self):
+        response = self.post_sheet(b"start_city,drop_city,Sedan\nDubai,Abu Dhabi,NaN\nAbu Dhabi,Dubai,1e30\nDubai,Dubai,90\n")
+
+        self.assertEqual(response.status_code, 200)
+        self.rate_card.refresh_from_db()
+        self.addCleanup(self.rate_card.rate_card_file.delete, save=False)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['errors'], [
+            {"row": 2, "errors": ["Invalid price 'NaN' for Sedan"]},
+            {"row": 3, "errors": ["Invalid price '1e30' for Sedan"]},
+        ])
+
+
+class VehicleMasterListQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def create_vehicles(self, start, count):
+        for index in range(start, start + count):
+            brand = VehicleBrand.objects.create(name=f"Brand {index}")
+            driver = DriverMaster.objects.create(
+                name=f"Driver {index}", id_no=str(index), mobile_number="1", whatsapp_number="1"
+            )
+            vehicle = VehicleMaster.objects.create(
+                name=f"Model {index}", brand=brand, driver=driver, photo=f"vehicles/{index}.jpg"
+            )
+            for month in (1, 6):
+                VehicleRateCard.objects.create(
+                    name=f"Card {index}-{month}", country="UAE", vehicle=vehicle,
+                    validity_start=date(2026, month, 1), validity_end=date(2026, 12, 31),
+                    rate_card_file=f"rate_cards/{index}-{month}.csv",
+                )
+
+    def test_query_count_does_not_grow_with_vehicles(self):
+        self.create_vehicles(0, 2)
+        response, queries = count_queries(self.client, '/api/vehicle-masters/', {})
+        self.assertEqual(len(response.data), 2)
+
+        self.create_vehicles(2, 5)
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/vehicle-masters/')
+        self.assertEqual(len(response.data), 7)
+        self.assertEqual(response.data[0]['brand_name'], "Brand 6")
+        self.assertTrue(response.data[0]['latest_rate_card_file'].endswith("rate_cards/6-6.csv"))
+
+
+class GalleryRenditionQueryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.destination = Destination.objects.create(name="Dubai", country="UAE")
+
+    def create_galleries(self, start, count):
+        for index in range(start, start + count):
+            sightseeing = SightseeingMaster.objects.create(destination=self.destination, name=f"Tour {index}")
+            accommodation = Accommodation.objects.create(name=f"Hotel {index}", city="Dubai")
+            for photo in range(2):
+                SightseeingImage.objects.create(sightseeing=sightseeing, image=f"sightseeing/gallery/{index}-{photo}.jpg")
+                AccommodationImage.objects.create(accommodation=accommodation, image=f"accommodations/{index}-{photo}.jpg")
+        for rendition in ImageRendition.objects.filter(status='Pending'):
+            rendition.status = 'Done'
+            rendition.renditions = {"webp": {"320": f"renditions/{rendition.source}_320.webp"}}
+            rendition.save()
+
+    def assert_constant_queries(self, url):
+        self.create_galleries(0, 2)
+        response, queries = count_queries(self.client, url, {})
+        self.assertEqual(len(response.data), 2)
+
+        self.create_galleries(2, 4)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 6)
+        for item in response.data:
+            self.assertEqual(len(item['images']), 2)
+            for image in item['images']:
+                self.assertIn("320w", image['image_srcset']['webp'])
+
+    def test_sightseeing_list_renditions(self):
+        self.assert_constant_queries('/api/sightseeing-masters/')
+
+    def test_accommodation_list_renditions(self):
+        self.assert_constant_queries('/api/accommodations/')
+
+
+class RenditionWorkerTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_images_are_rendered(self):
+        buffer = BytesIO()
+        Image.new('RGB', (800, 400)).save(buffer, 'JPEG')
+        name = default_storage.save("destinations/cards/goa.jpg", ContentFile(buffer.getvalue()))
+        Destination.objects.create(name="Goa", card_image=name)
+
+        self.assertEqual(render_pending_images(), (1, 0))
+        job = ImageRendition.objects.get(source=name)
+        self.assertEqual((job.status, job.attempts), ('Done', 1))
+        self.assertEqual(sorted(job.renditions['webp']), ["320", "640"])
+        self.assertTrue(default_storage.exists(job.renditions['webp']['320']))
+
+    def test_claimed_jobs_are_not_due_for_other_workers(self):
+        ImageRendition.objects.create(source="destinations/cards/goa.jpg", source_model="Holidays.Destination")
+
+        self.assertEqual(len(claim_pending_images(10)), 1)
+        self.assertEqual(claim_pending_images(10), [])
+
+    def test_failures_back_off_then_fail(self):
+        job = ImageRendition.objects.create(source="destinations/cards/missing.jpg", source_model="Holidays.Destination")
+
+        self.assertEqual(render_pending_images(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Pending', 1))
+        self.assertAlmostEqual(job.next_attempt_at - timezone.now(), timedelta(minutes=5), delta=timedelta(seconds=5))
+        self.assertEqual(render_pending_images(), (0, 0))
+
+        ImageRendition.objects.filter(pk=job.pk).update(attempts=2, next_attempt_at=timezone.now())
+        self.assertEqual(render_pending_images(max_attempts=3), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('Failed', 3))
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = ContentAddressedStorage()
+
+    def gc(self, *args):
+        call_command('gc_media_blobs', *args, stdout=StringIO())
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        names = {self.storage.save(f"destinations/cards/{index}.JPG", ContentFile(b"same photo")) for index in range(3)}
+
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, r"^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 3)
+
+        self.storage.delete(name)
+        self.storage.delete(name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+        self.assertTrue(self.storage.exists(name))
+
+    def test_gc_reconciles_counts_and_deletes_unreferenced_blobs(self):
+        name = self.storage.save("destinations/cards/goa.jpg", ContentFile(b"goa photo"))
+        self.storage.save("destinations/cards/copy.jpg", ContentFile(b"goa photo"))
+        destination = Destination.objects.create(name="Goa", card_image=name)
+
+        self.gc('--min-age', '0')
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+        destination.delete()
+        self.gc()
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 0)
+        self.assertTrue(self.storage.exists(name))
+
+        self.gc('--min-age', '0')
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(self.storage.exists(name))
+
+
+class OrphanedMediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_renditions_of_deleted_images_are_collected(self):
+        expected = {
+            "destinations/cards/a.jpg": True,
+            "renditions/destinations/cards/a_320.webp": True,
+            # Not listed by the image's rendition record any more
+            "renditions/destinations/cards/a_1024.webp": False,
+            # The source image is gone
+            "renditions/destinations/cards/gone_320.webp": False,
+            # No rendition record at all
+            "renditions/packages/cards/b_640_Ab3dE9x.avif": False,
+        }
+        for name in expected:
+            default_storage.save(name, ContentFile(b"data"))
+        Destination.objects.create(name="Goa", card_image="destinations/cards/a.jpg")
+        ImageRendition.objects.filter(source="destinations/cards/a.jpg").update(
+            status='Done', renditions={"webp": {"320": "renditions/destinations/cards/a_320.webp"}}
+        )
+        ImageRendition.objects.create(
+            source="destinations/cards/gone.jpg", source_model="Holidays.Destination", status='Done',
+            renditions={"webp": {"320": "renditions/destinations/cards/gone_320.webp"}},
+        )
+
+        call_command('gc_orphaned_media', '--delete', '--min-age', '0', stdout=StringIO())
+
+        self.assertEqual({name: default_storage.exists(name) for name in expected}, expected)
+        self.assertEqual(list(ImageRendition.objects.values_list('source', flat=True)), ["destinations/cards/a.jpg"])
+
+    def test_stale_rendition_records_are_deleted_batch_by_batch(self):
+        Destination.objects.create(name="Goa", card_image="destinations/cards/a.jpg")
+        for index in range(3):
+            ImageRendition.objects.create(source=f"destinations/cards/gone-{index}.jpg", source_model="Holidays.Destination")
+
+        output = StringIO()
+        call_command('gc_orphaned_media', '--delete', '--batch-size', '1', stdout=output)
+
+        self.assertIn("3 stale rendition records deleted", output.getvalue())
+        self.assertEqual(list(ImageRendition.objects.values_list('source', flat=True)), ["destinations/cards/a.jpg"])
+
+
+class CabAdditionalDocumentListTests(TestCase):
+    def test_list_is_not_paginated(self):
+        booking = CabBooking.objects.create(
+            vehicle_name="Innova", vehicle_category="SUV", price=100, from_city="Dubai", to_city="Abu Dhabi",
+            pickup_date=date(2026, 12, 1), guests=2, title="Mr", first_name="A", last_name="B", phone="1",
+            transfer_type="airport",
+        )
+        CabAdditionalDocument.objects.create(booking=booking, document_name="Ticket", file="cab_bookings/additional/t.pdf")
+
+        response = APIClient().get('/api/cab-additional-documents/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(response.data[0]['document_name'], "Ticket")
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(directory.name, 'media'),
+            UPLOAD_SESSION_DIR=os.path.join(directory.name, 'sessions'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.content = os.urandom(3000)
+
+    def start(self):
+        response = self.client.post('/api/uploads/', {'filename': "ticket.pdf", 'size': len(self.content)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['token']
+
+    def put_chunk(self, token, start, end):
+        return self.client.generic(
+            'PUT', f'/api/uploads/{token}/chunk/', self.content[start:end], content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(self.content)}",
+        )
+
+    def test_chunks_are_resumable_and_attach_by_token(self):
+        token = self.start()
+        self.assertEqual(self.put_chunk(token, 0, 1000).data['received'], 1000)
+        gap = self.put_chunk(token, 2000, 3000)
+        self.assertEqual((gap.status_code, gap.data['received']), (409, 1000))
+        self.assertEqual(self.put_chunk(token, 500, 2000).data['received'], 2000)
+        self.assertEqual(self.put_chunk(token, 2000, 3000).data['received'], 3000)
+
+        mismatch = self.client.post(f'/api/uploads/{token}/finalize/', {'sha256': "0" * 64}, format='json')
+        self.assertEqual(mismatch.status_code, 422)
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        response = self.client.post(f'/api/uploads/{token}/finalize/', {'sha256': sha256}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.put_chunk(token, 0, 1000).status_code, 409)
+
+        booking = CabBooking.objects.create(
+            vehicle_name="Innova", vehicle_category="SUV", price=100, from_city="Dubai", to_city="Abu Dhabi",
+            pickup_date=date(2026, 12, 1), guests=2, title="Mr", first_name="A", last_name="B", phone="1",
+            transfer_type="airport",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/cab-bookings/{booking.id}/', {
+                'additional_docs_count': 1, 'additional_doc_upload_0': token, 'additional_doc_name_0': "Ticket",
+            }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+        document = CabAdditionalDocument.objects.get(booking=booking)
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(UploadSession.objects.get(token=token).status, 'Attached')
+        self.assertFalse(os.path.exists(os.path.join(settings.UPLOAD_SESSION_DIR, token)))
+
+    def test_finalize_needs_every_byte(self):
+        token = self.start()
+        self.put_chunk(token, 0, 1000)
+
+        response = self.client.post(f'/api/uploads/{token}/finalize/', {}, format='json')
+
+        self.assertEqual((response.status_code, response.data['error']), (409, "Received 1000 of 3000 bytes"))
+
+
+class ConditionalGetTests(TestCase):
+    def test_not_modified_keeps_the_validators(self):
+        client = APIClient()
+        Destination.objects.create(name="Goa", country="India")
+
+        response = client.get('/api/destinations/')
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        response = client.get('/api/destinations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response['Last-Modified']), (etag, last_modified))
+        self.assertIn("no-cache", response['Cache-Control'])
+
+        Destination.objects.create(name="Kerala", country="India")
+        response = client.get('/api/destinations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SearchVisibilityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query, result_type):
+        response = self.client.get('/api/search/', {'q': query, 'type': result_type})
+        self.assertEqual(response.status_code, 200)
+        return {result['id'] for result in response.data['results']}
+
+    def test_inactive_and_expired_packages_are_not_found(self):
+        active = create_package(1, description="Lagoon cruise")
+        inactive = create_package(2, description="Lagoon cruise", is_active=False)
+        expired = create_package(3, description="Lagoon cruise", fixed_departure=True, fixed_departure_data=[
+            {'booking_valid_until': '2000-01-31'},
+        ])
+        open_departure = create_package(4, description="Lagoon cruise", fixed_departure=True, fixed_departure_data=[
+            {'booking_valid_until': '2999-01-31'},
+        ])
+
+        found = self.search("lagoon", 'package')
+        self.assertEqual(found, {active.id, open_departure.id})
+        self.assertNotIn(inactive.id, found)
+        self.assertNotIn(expired.id, found)
+
+    def test_inactive_visas_are_not_found(self):
+        fields = {'country': "Thailand", 'processing_time': "5 days"}
+        active = Visa.objects.create(title="Thailand Tourist Visa", **fields)
+        Visa.objects.create(title="Thailand Business Visa", is_active=False, **fields)
+
+        self.assertEqual(self.search("thailand", 'visa'), {active.id})
+
+    def test_highlights_escape_markup(self):
+        package = create_package(1, description="Lagoon <script>alert('x')</script> & reef")
+
+        response = self.client.get('/api/search/', {'q': "lagoon", 'type': 'package'})
+        result = response.data['results'][0]
+        self.assertEqual(result['id'], package.id)
+        self.assertEqual(
+            result['highlight'],
+            "<mark>Lagoon</mark> &lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt; &amp; reef",
+        )
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("SMTP is down")
+
+
+class OutboxTests(TestCase):
+    def test_api_queues_valid_addresses_only(self):
+        client = APIClient()
+        data = {'subject': "Your visa", 'body': "Details"}
+
+        response = client.post('/api/send-visa-details/', {'email': "guest@example", **data}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        response = client.post('/api/send-visa-details/', {'email': "guest@example.com", **data}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(OutboundEmail.objects.get().recipients, ["guest@example.com"])
+        self.assertEqual(mail.outbox, [])
+
+    def test_worker_sends_due_emails(self):
+        email = queue_email("Your visa", "Details", ["guest@example.com"])
+
+        self.assertEqual(send_due_emails(), (1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Sent', 1))
+        self.assertEqual(mail.outbox[0].to, ["guest@example.com"])
+
+    def test_claimed_emails_are_not_due_for_other_workers(self):
+        queue_email("Your visa", "Details", ["guest@example.com"])
+
+        self.assertEqual(len(claim_due_emails(10)), 1)
+        self.assertEqual(claim_due_emails(10), [])
+        self.assertEqual(send_due_emails(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='Holidays.tests.FailingEmailBackend')
+    def test_failures_back_off_then_fail(self):
+        email = queue_email("Your visa", "Details", ["guest@example.com"])
+
+        self.assertEqual(send_due_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('Pending', 1, "SMTP is down"))
+        self.assertAlmostEqual(email.next_attempt_at - timezone.now(), timedelta(minutes=1), delta=timedelta(seconds=5))
+        self.assertEqual(send_due_emails(), (0, 0))
+
+        OutboundEmail.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+        self.assertEqual(send_due_emails(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Failed', MAX_ATTEMPTS))
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import re
+import secrets
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import UploadSession
+
+# Bytes read from the request body per write
+READ_SIZE = 64 * 1024
+# Largest chunk accepted by one PUT
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def new_token():
+    return secrets.token_urlsafe(32)
+
+
+def session_dir(session):
+    # Chunks are staged on a local (or shared, with several web nodes) disk
+    # rather than in media storage: the Storage API has no offset or append
+    # writes, and content-addressed storage names a file by its hash, which
+    # is only known once the upload is complete
+    return os.path.join(settings.UPLOAD_SESSION_DIR, session.token)
+
+
+def partial_path(session):
+    # The chunks joined into one file by finalize_session
+    return os.path.join(session_dir(session), 'data')
+
+
+def chunk_path(session, offset, length):
+    # Zero-padded so the names sort in offset order
+    return os.path.join(session_dir(session), f"{offset:020d}-{length:020d}.chunk")
+
+
+def chunk_offset(request, session, length):
+    # "Content-Range: bytes 0-1048575/5000000", else ?offset=, else append
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match:
+            raise UploadError("Invalid Content-Range header")
+        start, end = int(match.group(1)), int(match.group(2))
+        if end - start + 1 != length:
+            raise UploadError("Content-Range does not match Content-Length")
+        return start
+    offset = request.query_params.get('offset')
+    if offset is not None:
+        if not offset.isdigit():
+            raise UploadError("offset must be a non-negative integer")
+        return int(offset)
+    return session.received
+
+
+def check_chunk(session, offset, length):
+    if session.status != 'Pending':
+        raise UploadError("Upload is already finalized", status=409)
+    if offset > session.received:
+        raise UploadError(f"Expected offset {session.received}", status=409)
+    if length > MAX_CHUNK_SIZE:
+        raise UploadError(f"Chunks are limited to {MAX_CHUNK_SIZE} bytes", status=413)
+    if offset + length > session.size:
+        raise UploadError("Chunk extends past the declared size")
+
+
+def write_chunk(session_id, stream, offset, length):
+    # Copies one chunk from the request body into its own file, then locks
+    # the session only to accept it. Chunks may be resent, but must not leave
+    # a gap after what was received.
+    session = UploadSession.objects.get(pk=session_id)
+    check_chunk(session, offset, length)
+
+    directory = session_dir(session)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        written = 0
+        with os.fdopen(fd, 'wb') as f:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+        if written < length:
+            raise UploadError("Chunk body is shorter than Content-Length")
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id)
+            check_chunk(session, offset, length)
+            os.replace(temp_path, chunk_path(session, offset, length))
+            session.received = max(session.received, offset + length)
+            session.save(update_fields=['received', 'updated_at'])
+    finally:
+        remove_files([temp_path])
+    return session
+
+
+def join_chunks(session):
+    # Writes the chunks into partial_path in offset order; resent chunks
+    # overwrite the same range. Returns the chunk paths.
+    directory = session_dir(session)
+    chunks = sorted(name for name in os.listdir(directory) if name.endswith('.chunk')) if os.path.isdir(directory) else []
+    with open(partial_path(session), 'wb') as f:
+        for name in chunks:
+            f.seek(int(name.split('-')[0]))
+            with open(os.path.join(directory, name), 'rb') as chunk:
+                shutil.copyfileobj(chunk, f, READ_SIZE)
+    return [os.path.join(directory, name) for name in chunks]
+
+
+def finalize_session(session_id, checksum=None):
+    # Checks the partial file is complete (and matches the client's SHA-256
+    # when one is given), then makes the session attachable
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id)
+        if session.status != 'Pending':
+            return session
+        if session.received != session.size:
+            raise UploadError(f"Received {session.received} of {session.size} bytes", status=409)
+        chunks = join_chunks(session)
+        path = partial_path(session)
+        if os.path.getsize(path) != session.size:
+            raise UploadError(f"Received {session.received} of {session.size} bytes", status=409)
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(READ_SIZE), b''):
+                hasher.update(data)
+        digest = hasher.hexdigest()
+        if checksum and checksum.lower() != digest:
+            raise UploadError("Checksum does not match the uploaded data", status=422)
+        session.checksum, session.status = digest, 'Complete'
+        session.save(update_fields=['checksum', 'status', 'updated_at'])
+    remove_files(chunks)
+    return session
+
+
+def claim_uploads(tokens):
+    # Locks the finished sessions for the given tokens for the surrounding
+    # transaction; returns {token: session}
+    tokens = {token for token in tokens if token}
+    if not tokens:
+        return {}
+    sessions = {
+        session.token: session
+        for session in UploadSession.objects.select_for_update().filter(token__in=tokens, status='Complete')
+    }
+    missing = tokens - sessions.keys()
+    if missing:
+        raise serializers.ValidationError({"uploads": [f"Unknown or unfinished upload: {token}" for token in sorted(missing)]})
+    return sessions
+
+
+def upload_file(session):
+    # The finished upload as a File; storage copies it in chunks on save
+    return File(open(partial_path(session), 'rb'), name=session.filename)
+
+
+def mark_attached(sessions):
+    # Tokens are single use; staged files are removed once the rows commit
+    if not sessions:
+        return
+    UploadSession.objects.filter(pk__in=[session.pk for session in sessions]).update(
+        status='Attached', updated_at=timezone.now()
+    )
+    directories = [session_dir(session) for session in sessions]
+    transaction.on_commit(lambda: remove_session_dirs(directories))
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def remove_session_dirs(directories):
+    for directory in directories:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def expire_sessions(max_age_hours):
+    # Deletes sessions untouched for max_age_hours and their staged files.
+    # Returns the number deleted.
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    expired = list(UploadSession.objects.filter(updated_at__lt=cutoff).only('pk', 'token'))
+    UploadSession.objects.filter(pk__in=[session.pk for session in expired]).delete()
+    remove_session_dirs([session_dir(session) for session in expired])
+    return len(expired)
@@ -33,10 +33,14 @@ router.register("vehicle-rate-cards", views.VehicleRateCardViewSet, basename="ve
 router.register("pickup-point-masters", views.PickupPointMasterViewSet, basename="pickup-point-master")
 router.register("cab-bookings", views.CabBookingViewSet, basename="cab-booking")
 router.register("cab-additional-documents", views.CabAdditionalDocumentViewSet, basename="cab-additional-document")
+router.register("uploads", views.UploadSessionViewSet, basename="upload-session")
 
 urlpatterns = [
     path('', include(router.urls)),
     path('admin-login/', views.AdminLoginView.as_view(), name='admin-login'),
     path('send-visa-details/', views.SendVisaDetailsAPI.as_view(), name='send-visa-details'),
     path('cab-search/', views.CabSearchAPI.as_view(), name='cab-search'),
+    path('cab-search/stats/', views.CabSearchStatsAPI.as_view(), name='cab-search-stats'),
+    path('city-suggest/', views.CitySuggestAPI.as_view(), name='city-suggest'),
+    path('search/', views.SearchAPI.as_view(), name='search'),
 ]
@@ -1,37 +1,47 @@
+import hashlib
 import json
+import time
+from datetime import datetime, time as dt_time, timedelta
 
 # Django Imports
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
-from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.validators import validate_email
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 # Rest Framework Imports
-from rest_framework import status, serializers
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework import mixins, status, serializers
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.generics import ListAPIView, CreateAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import authentication_classes, permission_classes
+from rest_framework.decorators import action, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny
+from rest_framework.utils.urls import replace_query_param
 
 # Local App Imports
 from .models import (
-    HolidayEnquiry, UmrahEnquiry, Enquiry, HolidayPackage, Destination,
+    HolidayEnquiry, UmrahEnquiry, Enquiry, HolidayPackage, PackageDestination, Destination,
     StartingCity, ItineraryMaster, Nationality, UmrahDestination, Visa,
     VisaApplication, VisaApplicant, VisaAdditionalDocument, Country,
     Supplier, CruiseCalendar, HotelMaster, Airline, SightseeingMaster,
     SightseeingImage, MealMaster, VehicleBrand, Accommodation,
     AccommodationImage, RoomType, VehicleMaster, DriverMaster,
     VehicleRateCard, PickupPointMaster, CabBooking, CabAdditionalDocument,
-    CancellationPolicy
+    CancellationPolicy, VehicleRoute, UploadSession
 )
 from .serializers import (
     HolidayEnquirySerializer, UmrahEnquirySerializer, EnquirySerializer,
-    HolidayPackageSerializer, DestinationSerializer, StartingCitySerializer,
+    HolidayPackageSerializer, HolidayPackageCardSerializer, DestinationSerializer, StartingCitySerializer,
     ItineraryMasterSerializer, UserSerializer, NationalitySerializer,
     UmrahDestinationSerializer, VisaSerializer, VisaApplicationSerializer,
+    VisaApplicationSummarySerializer,
     VisaApplicantSerializer, VisaAdditionalDocumentSerializer,
     CountrySerializer, SupplierSerializer, CruiseCalendarSerializer,
     HotelMasterSerializer, AirlineSerializer, SightseeingMasterSerializer,
@@ -39,7 +49,20 @@ from .serializers import (
     RoomTypeSerializer, VehicleMasterSerializer, DriverMasterSerializer,
     VehicleRateCardSerializer, PickupPointMasterSerializer,
     CabBookingSerializer, CabAdditionalDocumentSerializer,
-    CancellationPolicySerializer
+    CancellationPolicySerializer, UploadSessionSerializer
+)
+from .city_index import get_city_index
+from .caching import (
+    API_CACHE, CachedListMixin, ConditionalGetMixin, get_cache_stats,
+    get_collection_versions, record_cache_lookup
+)
+from .outbox import queue_email
+from .pagination import OptionalCursorPagination
+from .rate_card_import import RateCardImportError, import_rate_card
+from .search import MAX_RESULTS, SEARCH_SOURCES, search_catalogue
+from .uploads import (
+    UploadError, chunk_offset, claim_uploads, finalize_session, mark_attached,
+    new_token, upload_file, write_chunk
 )
 
 @authentication_classes([])
@@ -90,11 +113,40 @@ class EnquiryAPI(ModelViewSet):
     serializer_class = EnquirySerializer
 
 
-class HolidayPackageViewSet(ModelViewSet):
+class HolidayPackageViewSet(ConditionalGetMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = HolidayPackage.objects.all()
     serializer_class = HolidayPackageSerializer
+    pagination_class = OptionalCursorPagination
+    # Fixed departure slots expire by date, so the validators change daily too
+    conditional_on_date = True
+
+    # Stable sort orders for ?sort=; id breaks ties so cursors never skip rows
+    sort_orders = {
+        'newest': ('-created_at', '-id'),
+        'price_asc': ('Offer_price', 'id'),
+        'price_desc': ('-Offer_price', '-id'),
+        'days_asc': ('days', 'id'),
+        'days_desc': ('-days', '-id'),
+    }
+
+    def get_ordering(self):
+        return self.sort_orders.get(self.request.query_params.get('sort'), self.sort_orders['newest'])
+
+    def get_int_param(self, name):
+        try:
+            return int(self.request.query_params.get(name))
+        except (TypeError, ValueError):
+            return None
+
+    def is_card_view(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'card'
+
+    def get_serializer_class(self):
+        if self.is_card_view():
+            return HolidayPackageCardSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         queryset = HolidayPackage.objects.all()
@@ -104,40 +156,8 @@ class HolidayPackageViewSet(ModelViewSet):
         
         # In list view, we usually filter by is_active unless 'all=true' is passed
         if self.action == 'list' and not is_all:
-            today = timezone.now().date()
-            
-            # Filter by is_active first
-            queryset = queryset.filter(is_active=True)
-            
-            # Filter out expired fixed departures
-            packages = list(queryset)
-            active_ids = []
-            for pkg in packages:
-                if pkg.fixed_departure and pkg.fixed_departure_data:
-                    try:
-                        # Check if any travel date's booking is still valid
-                        is_valid = False
-                        data = pkg.fixed_departure_data
-                        if isinstance(data, str):
-                            data = json.loads(data)
-                        
-                        for slot in data:
-                            valid_until_str = slot.get('booking_valid_until')
-                            if valid_until_str:
-                                valid_until = timezone.datetime.strptime(valid_until_str, '%Y-%m-%d').date()
-                                if valid_until >= today:
-                                    is_valid = True
-                                    break
-                        if is_valid:
-                            active_ids.append(pkg.id)
-                    except:
-                        # If parsing fails, keep it active to be safe
-                        active_ids.append(pkg.id)
-                else:
-                    # Regular packages are already filtered by is_active
-                    active_ids.append(pkg.id)
-            
-            queryset = queryset.filter(id__in=active_ids)
+            # Filter by is_active and drop fixed departures whose booking window has closed
+            queryset = queryset.filter(HolidayPackage.public_filter())
 
         with_flight = self.request.query_params.get('with_flight', None)
         if with_flight is not None:
@@ -145,11 +165,68 @@ class HolidayPackageViewSet(ModelViewSet):
                  queryset = queryset.filter(with_flight=True)
              elif with_flight.lower() == 'false':
                  queryset = queryset.filter(with_flight=False)
+
+        if self.action == 'list':
+            queryset = self.filter_catalogue(queryset).order_by(*self.get_ordering())
+
+        if self.is_card_view():
+            # Only select the columns the listing cards render (plus created_at for the cursor)
+            queryset = queryset.only(
+                'id', 'title', 'card_image', 'Offer_price', 'price', 'days', 'category', 'starting_city',
+                'created_at'
+            ).annotate(nights=Coalesce(Sum('extra_destinations__nights'), 0))
+        elif self.action in ('list', 'retrieve'):
+            # Load every nested relation the serializer renders in a fixed number of queries
+            queryset = queryset.prefetch_related(
+                'itinerary', 'inclusions', 'exclusions', 'highlights',
+                'cancellation_policies', 'vehicles',
+                Prefetch('extra_destinations', queryset=PackageDestination.objects.select_related('destination')),
+            )
                  
         return queryset
 
+    def filter_catalogue(self, queryset):
+        params = self.request.query_params
+
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        starting_city = params.get('starting_city')
+        if starting_city:
+            queryset = queryset.filter(starting_city=starting_city)
+
+        fixed_departure = params.get('fixed_departure')
+        if fixed_departure is not None and fixed_departure.lower() in ('true', 'false'):
+            queryset = queryset.filter(fixed_departure=fixed_departure.lower() == 'true')
+
+        min_price = self.get_int_param('min_price')
+        if min_price is not None:
+            queryset = queryset.filter(Offer_price__gte=min_price)
+        max_price = self.get_int_param('max_price')
+        if max_price is not None:
+            queryset = queryset.filter(Offer_price__lte=max_price)
+
+        min_days = self.get_int_param('min_days')
+        if min_days is not None:
+            queryset = queryset.filter(days__gte=min_days)
+        max_days = self.get_int_param('max_days')
+        if max_days is not None:
+            queryset = queryset.filter(days__lte=max_days)
+
+        # Destination by id or name; a subquery avoids duplicate rows from the join
+        destination = params.get('destination')
+        if destination:
+            if destination.isdigit():
+                package_destinations = PackageDestination.objects.filter(destination_id=destination)
+            else:
+                package_destinations = PackageDestination.objects.filter(destination__name=destination)
+            queryset = queryset.filter(id__in=package_destinations.values('package_id'))
+
+        return queryset
+
 
-class DestinationViewSet(ModelViewSet):
+class DestinationViewSet(ConditionalGetMixin, CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Destination.objects.all()
@@ -164,7 +241,7 @@ class DestinationViewSet(ModelViewSet):
         return queryset
 
 
-class StartingCityViewSet(ModelViewSet):
+class StartingCityViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = StartingCity.objects.all()
@@ -187,7 +264,7 @@ class UserViewSet(ModelViewSet):
     pagination_class = None
 
 
-class NationalityViewSet(ModelViewSet):
+class NationalityViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Nationality.objects.all()
@@ -196,7 +273,7 @@ class NationalityViewSet(ModelViewSet):
 
 
 
-class UmrahDestinationViewSet(ModelViewSet):
+class UmrahDestinationViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = UmrahDestination.objects.all()
@@ -204,7 +281,7 @@ class UmrahDestinationViewSet(ModelViewSet):
     pagination_class = None
 
 
-class VisaViewSet(ModelViewSet):
+class VisaViewSet(ConditionalGetMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Visa.objects.all()
@@ -212,7 +289,7 @@ class VisaViewSet(ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        queryset = Visa.objects.all()
+        queryset = Visa.objects.select_related('supplier')
         is_all = self.request.query_params.get('all', 'false').lower() == 'true'
         
         # Admin view or explicit 'all' param
@@ -223,22 +300,84 @@ class VisaViewSet(ModelViewSet):
         country = self.request.query_params.get('country', None)
         is_popular = self.request.query_params.get('is_popular', None)
         
-        queryset = queryset.filter(is_active=True)
+        queryset = queryset.filter(Visa.public_filter())
         
         if country:
-            queryset = queryset.filter(country__iexact=country)
+            queryset = queryset.filter(country_key=Visa.normalize_country(country))
             
         if is_popular is not None:
             queryset = queryset.filter(is_popular=is_popular.lower() == 'true')
             
         return queryset
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            # Resolve every visa's country from one query instead of one per row
+            context['countries_by_name'] = {country.name: country for country in Country.objects.all()}
+        return context
+
 
 class VisaApplicationViewSet(ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
-    queryset = VisaApplication.objects.all().order_by('-created_at')
+    queryset = VisaApplication.objects.all().order_by('-created_at', '-id')
     serializer_class = VisaApplicationSerializer
+    pagination_class = OptionalCursorPagination
+
+    def is_summary_view(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
+    def get_serializer_class(self):
+        if self.is_summary_view():
+            return VisaApplicationSummarySerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = self.filter_applications(queryset)
+        if self.is_summary_view():
+            return queryset.select_related('visa').annotate(applicant_count=Count('applicants'))
+        if self.action in ('list', 'retrieve'):
+            return queryset.select_related('visa').prefetch_related('applicants__additional_documents')
+        return queryset
+
+    def filter_applications(self, queryset):
+        params = self.request.query_params
+        # ?status=Pending,Processing
+        statuses = [value for value in params.get('status', '').split(',') if value]
+        if statuses:
+            queryset = queryset.filter(status__in=statuses)
+        application_type = params.get('application_type')
+        if application_type:
+            queryset = queryset.filter(application_type=application_type)
+        visa_id = params.get('visa')
+        if visa_id and visa_id.isdigit():
+            queryset = queryset.filter(visa_id=visa_id)
+
+        # ?created_from=YYYY-MM-DD&created_to=YYYY-MM-DD, both inclusive. Day
+        # bounds are compared as datetimes so the created_at indexes apply.
+        created_from = self.parse_date_param('created_from')
+        if created_from:
+            queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(created_from, dt_time.min)))
+        created_to = self.parse_date_param('created_to')
+        if created_to:
+            queryset = queryset.filter(created_at__lt=timezone.make_aware(datetime.combine(created_to + timedelta(days=1), dt_time.min)))
+        return queryset
+
+    def parse_date_param(self, name):
+        try:
+            return datetime.strptime(self.request.query_params.get(name, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Stream every uploaded file to a temporary file instead of memory;
+        # storage then moves it into place
+        if request.method == 'POST':
+            request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def create(self, request, *args, **kwargs):
         data = request.data
@@ -250,41 +389,81 @@ class VisaApplicationViewSet(ModelViewSet):
             
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        application = serializer.save()
-        
-        for i, applicant_data in enumerate(applicants_list):
-            passport_front = request.FILES.get(f'applicant_{i}_passport_front')
-            photo = request.FILES.get(f'applicant_{i}_photo')
-            
-            applicant = VisaApplicant.objects.create(
-                application=application,
-                first_name=applicant_data.get('first_name', ''),
-                last_name=applicant_data.get('last_name', ''),
-                passport_number=applicant_data.get('passport_number', ''),
-                nationality=applicant_data.get('nationality', ''),
-                sex=applicant_data.get('sex', 'Male'),
-                dob=applicant_data.get('dob'),
-                place_of_birth=applicant_data.get('place_of_birth', ''),
-                place_of_issue=applicant_data.get('place_of_issue', ''),
-                marital_status=applicant_data.get('marital_status', 'Single'),
-                date_of_issue=applicant_data.get('date_of_issue'),
-                date_of_expiry=applicant_data.get('date_of_expiry'),
-                passport_front=passport_front,
-                photo=photo
-            )
 
-            # Handle additional documents
-            additional_docs = applicant_data.get('additional_documents', [])
-            for j, doc_data in enumerate(additional_docs):
-                doc_file = request.FILES.get(f'applicant_{i}_additional_doc_{j}')
-                if doc_file:
-                    VisaAdditionalDocument.objects.create(
-                        applicant=applicant,
-                        document_name=doc_data.get('name', f'Document {j+1}'),
-                        file=doc_file
+        # Files may also arrive as finished upload tokens (UploadSessionViewSet):
+        # "passport_front_upload"/"photo_upload" per applicant, "upload" per document
+        tokens = [
+            token
+            for applicant_data in applicants_list
+            for token in [applicant_data.get('passport_front_upload'), applicant_data.get('photo_upload')]
+            + [doc_data.get('upload') for doc_data in applicant_data.get('additional_documents', [])]
+        ]
+        applicants, documents, opened = [], [], []
+
+        def attached_file(file_key, token):
+            if request.FILES.get(file_key):
+                return request.FILES[file_key]
+            if token:
+                opened.append(upload_file(uploads[token]))
+                return opened[-1]
+            return None
+
+        try:
+            # The application, its applicants and their documents are saved together
+            with transaction.atomic():
+                uploads = claim_uploads(tokens)
+                application = serializer.save()
+                for i, applicant_data in enumerate(applicants_list):
+                    applicant = VisaApplicant(
+                        application=application,
+                        first_name=applicant_data.get('first_name', ''),
+                        last_name=applicant_data.get('last_name', ''),
+                        passport_number=applicant_data.get('passport_number', ''),
+                        nationality=applicant_data.get('nationality', ''),
+                        sex=applicant_data.get('sex', 'Male'),
+                        dob=applicant_data.get('dob'),
+                        place_of_birth=applicant_data.get('place_of_birth', ''),
+                        place_of_issue=applicant_data.get('place_of_issue', ''),
+                        marital_status=applicant_data.get('marital_status', 'Single'),
+                        date_of_issue=applicant_data.get('date_of_issue'),
+                        date_of_expiry=applicant_data.get('date_of_expiry'),
+                        passport_front=attached_file(f'applicant_{i}_passport_front', applicant_data.get('passport_front_upload')),
+                        photo=attached_file(f'applicant_{i}_photo', applicant_data.get('photo_upload'))
                     )
-            
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+                    applicants.append(applicant)
+
+                    # Handle additional documents
+                    additional_docs = applicant_data.get('additional_documents', [])
+                    for j, doc_data in enumerate(additional_docs):
+                        doc_file = attached_file(f'applicant_{i}_additional_doc_{j}', doc_data.get('upload'))
+                        if doc_file:
+                            documents.append(VisaAdditionalDocument(
+                                applicant=applicant,
+                                document_name=doc_data.get('name', f'Document {j+1}'),
+                                file=doc_file
+                            ))
+
+                # bulk_create stores each upload as its row is prepared
+                VisaApplicant.objects.bulk_create(applicants)
+                VisaAdditionalDocument.objects.bulk_create(documents)
+                mark_attached(uploads.values())
+        except Exception as e:
+            # Files already written by a rolled back insert would be orphaned
+            stored = [f for a in applicants for f in (a.passport_front, a.photo)] + [d.file for d in documents]
+            for field_file in stored:
+                if field_file and field_file._committed:
+                    field_file.storage.delete(field_file.name)
+            if isinstance(e, DjangoValidationError):
+                raise serializers.ValidationError({"applicants_data": e.messages})
+            raise
+        finally:
+            for file in opened:
+                file.close()
+
+        application = VisaApplication.objects.select_related('visa').prefetch_related(
+            'applicants__additional_documents'
+        ).get(pk=application.pk)
+        return Response(self.get_serializer(application).data, status=status.HTTP_201_CREATED)
 
 
 class VisaApplicantViewSet(ModelViewSet):
@@ -303,7 +482,7 @@ class VisaAdditionalDocumentViewSet(ModelViewSet):
     pagination_class = None
 
 
-class CountryViewSet(ModelViewSet):
+class CountryViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Country.objects.all()
@@ -327,20 +506,20 @@ class SendVisaDetailsAPI(APIView):
         
         if not email or not subject or not body:
             return Response({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
-        
+
+        # Checked here, since the worker cannot report a bad address back to the caller
         try:
-            send_mail(
-                subject,
-                body,
-                settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'hello@goimomi.com',
-                [email],
-                fail_silently=False,
-            )
-            return Response({"success": "Email sent successfully"})
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            if not isinstance(email, str):
+                raise DjangoValidationError("Email must be a string")
+            validate_email(email)
+        except DjangoValidationError:
+            return Response({"error": "Invalid email address"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Sent by the send_queued_emails worker so SMTP never blocks the request
+        queue_email(subject, body, [email])
+        return Response({"success": "Email queued for delivery"}, status=status.HTTP_202_ACCEPTED)
 
-class CruiseCalendarViewSet(ModelViewSet):
+class CruiseCalendarViewSet(ConditionalGetMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = CruiseCalendar.objects.all().order_by('-created_at')
@@ -354,7 +533,7 @@ class HotelMasterViewSet(ModelViewSet):
     serializer_class = HotelMasterSerializer
     pagination_class = None
 
-class AirlineViewSet(ModelViewSet):
+class AirlineViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Airline.objects.all().order_by('name')
@@ -366,6 +545,13 @@ class SightseeingMasterViewSet(ModelViewSet):
     queryset = SightseeingMaster.objects.all()
     serializer_class = SightseeingMasterSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Gallery images and their renditions load in a fixed number of queries
+            return queryset.prefetch_related('images')
+        return queryset
+
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         
@@ -422,23 +608,25 @@ class MealMasterViewSet(ModelViewSet):
     serializer_class = MealMasterSerializer
     pagination_class = None
 
-class VehicleBrandViewSet(ModelViewSet):
+class VehicleBrandViewSet(CachedListMixin, ModelViewSet):
     permission_classes = [AllowAny]
     queryset = VehicleBrand.objects.all().order_by('name')
     serializer_class = VehicleBrandSerializer
     pagination_class = None
 
-    def list(self, request, *args, **kwargs):
-        # Health check log
-        print(f"INFO: VehicleBrand API accessed. Total brands: {self.get_queryset().count()}")
-        return super().list(request, *args, **kwargs)
-
 class AccommodationViewSet(ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = Accommodation.objects.all().order_by('-created_at')
     serializer_class = AccommodationSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # One query for the images of every accommodation, one for their renditions
+            return queryset.prefetch_related('images')
+        return queryset
+
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         serializer = self.get_serializer(data=data)
@@ -469,7 +657,7 @@ class AccommodationViewSet(ModelViewSet):
 
         return Response(serializer.data)
 
-class RoomTypeViewSet(ModelViewSet):
+class RoomTypeViewSet(CachedListMixin, ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
     queryset = RoomType.objects.all()
@@ -482,6 +670,15 @@ class VehicleMasterViewSet(ModelViewSet):
     serializer_class = VehicleMasterSerializer
     pagination_class = None
 
+    def get_queryset(self):
+        # Brand, driver and the latest rate card file come from the same query
+        latest_rate_card = VehicleRateCard.objects.filter(
+            vehicle=OuterRef('pk')
+        ).order_by('-created_at', '-id').values('rate_card_file')[:1]
+        return super().get_queryset().select_related('brand', 'driver').annotate(
+            latest_rate_card_file_name=Subquery(latest_rate_card)
+        )
+
 class DriverMasterViewSet(ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
@@ -505,6 +702,34 @@ class VehicleRateCardViewSet(ModelViewSet):
         if vehicle_id:
             queryset = queryset.filter(vehicle_id=vehicle_id)
         return queryset
+
+    @action(detail=True, methods=['post'], url_path='import')
+    def import_routes(self, request, pk=None):
+        # Replaces the routes with an uploaded CSV/XLSX sheet, see rate_card_import.py
+        rate_card = self.get_object()
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"error": "Upload the rate sheet as 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+
+        # The sheet is imported before it is stored, so a rejected sheet never
+        # replaces the file behind the current routes
+        stored = None
+        try:
+            with transaction.atomic():
+                report = import_rate_card(rate_card, upload.file, upload.name, dry_run=dry_run)
+                if not dry_run:
+                    rate_card.rate_card_file.save(upload.name, upload, save=False)
+                    stored = rate_card.rate_card_file.name
+                    VehicleRateCard.objects.filter(pk=rate_card.pk).update(rate_card_file=stored)
+        except Exception as e:
+            if stored:
+                rate_card.rate_card_file.storage.delete(stored)
+            if isinstance(e, RateCardImportError):
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            raise
+        return Response(report)
+
 class PickupPointMasterViewSet(ModelViewSet):
     authentication_classes = []
     permission_classes = [AllowAny]
@@ -532,7 +757,6 @@ class CabBookingViewSet(ModelViewSet):
             
         serializer = self.get_serializer(instance, data=data, partial=True)
         serializer.is_valid(raise_exception=True)
-        booking = serializer.save()
 
         # Handle additional documents
         docs_count = request.data.get('additional_docs_count', 0)
@@ -541,15 +765,29 @@ class CabBookingViewSet(ModelViewSet):
         except:
             docs_count = 0
             
-        for i in range(docs_count):
-            file = request.FILES.get(f'additional_doc_{i}')
-            name = request.data.get(f'additional_doc_name_{i}', f'Document {i+1}')
-            if file:
-                CabAdditionalDocument.objects.create(
-                    booking=booking,
-                    document_name=name,
-                    file=file
-                )
+        # Each document is a file (additional_doc_<i>) or a finished upload
+        # token (additional_doc_upload_<i>, see UploadSessionViewSet)
+        with transaction.atomic():
+            uploads = claim_uploads(request.data.get(f'additional_doc_upload_{i}') for i in range(docs_count))
+            booking = serializer.save()
+            for i in range(docs_count):
+                file = request.FILES.get(f'additional_doc_{i}')
+                token = request.data.get(f'additional_doc_upload_{i}')
+                name = request.data.get(f'additional_doc_name_{i}', f'Document {i+1}')
+                if file:
+                    CabAdditionalDocument.objects.create(
+                        booking=booking,
+                        document_name=name,
+                        file=file
+                    )
+                elif token:
+                    with upload_file(uploads[token]) as file:
+                        CabAdditionalDocument.objects.create(
+                            booking=booking,
+                            document_name=name,
+                            file=file
+                        )
+            mark_attached(uploads.values())
         
         # Handle removals
         remove_ids = request.data.get('remove_doc_ids')
@@ -557,7 +795,11 @@ class CabBookingViewSet(ModelViewSet):
             try:
                 ids = json.loads(remove_ids) if isinstance(remove_ids, str) else remove_ids
                 if ids:
-                    CabAdditionalDocument.objects.filter(id__in=ids, booking=booking).delete()
+                    removed = CabAdditionalDocument.objects.filter(id__in=ids, booking=booking)
+                    files = [doc.file for doc in removed if doc.file]
+                    removed.delete()
+                    for file in files:
+                        file.storage.delete(file.name)
             except:
                 pass
 
@@ -570,23 +812,69 @@ class CabAdditionalDocumentViewSet(ModelViewSet):
     serializer_class = CabAdditionalDocumentSerializer
     pagination_class = None
 
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+    # Resumable uploads for large documents:
+    #   POST uploads/ {filename, size, content_type} -> token
+    #   PUT uploads/<token>/chunk/ with the raw bytes and a Content-Range header
+    #   GET uploads/<token>/ -> bytes received so far, to resume after a failure
+    #   POST uploads/<token>/finalize/ {sha256 (optional)}
+    # The token is then sent in place of the file when creating visa
+    # applications or updating cab bookings.
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+    lookup_field = 'token'
+
+    def perform_create(self, serializer):
+        serializer.save(token=new_token())
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, token=None):
+        # The body is read straight from the socket in small pieces; it is
+        # never parsed into request.data
+        session = self.get_object()
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if not length:
+            return Response({"error": "Send the chunk as the request body"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = chunk_offset(request, session, length)
+            session = write_chunk(session.pk, request.stream, offset, length)
+        except UploadError as e:
+            return Response(
+                {"error": str(e), "received": UploadSession.objects.get(pk=session.pk).received},
+                status=e.status,
+            )
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, token=None):
+        session = self.get_object()
+        try:
+            session = finalize_session(session.pk, request.data.get('sha256'))
+        except UploadError as e:
+            return Response({"error": str(e)}, status=e.status)
+        return Response(self.get_serializer(session).data)
+
 class CabSearchAPI(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    # Cached results are dropped whenever one of these is written
+    cache_collections = (VehicleRateCard, VehicleMaster, VehicleBrand)
 
     def get(self, request):
-        # Extract and clean parameters
-        from_city = request.query_params.get('from_city', '').split('(')[0].split(',')[0].strip().lower()
-        if not from_city:
-            from_city = request.query_params.get('from_city', '').strip().lower()
-            
-        to_city = request.query_params.get('to_city', '').split('(')[0].split(',')[0].strip().lower()
-        if not to_city:
-            to_city = request.query_params.get('to_city', '').strip().lower()
-            
+        started = time.perf_counter()
+        # Resolve both cities (names, aliases, IATA codes) to their route keys
+        city_index = get_city_index()
+        from_keys = city_index.route_keys(request.query_params.get('from_city'))
+        to_keys = city_index.route_keys(request.query_params.get('to_city'))
         pickup_date = request.query_params.get('pickup_date')
 
-        if not from_city or not to_city or not pickup_date:
+        if not from_keys or not to_keys or not pickup_date:
             return Response({"error": "Missing parameters"}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
@@ -594,76 +882,119 @@ class CabSearchAPI(APIView):
         except:
             return Response({"error": "Invalid date format"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Find rate cards valid for the date
-        rate_cards = VehicleRateCard.objects.filter(
+        cache = caches[API_CACHE]
+        key = self.get_cache_key(from_keys, to_keys, p_date)
+        options = cache.get(key)
+        hit = options is not None
+        if not hit:
+            options = self.search(from_keys, to_keys, p_date)
+            cache.set(key, options)
+
+        elapsed = time.perf_counter() - started
+        record_cache_lookup('cab-search', hit, elapsed)
+        response = Response(options)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        response['Server-Timing'] = f'cab-search;desc="{response["X-Cache"]}";dur={elapsed * 1000:.2f}'
+        return response
+
+    def get_cache_key(self, from_keys, to_keys, p_date):
+        # Dates covered by the same set of rate cards share one entry
+        cache = caches[API_CACHE]
+        versions = [stamp.version if stamp else 0 for stamp in get_collection_versions(self.cache_collections)]
+        windows_key = f"cab-search:windows:{versions[0]}"
+        windows = cache.get(windows_key)
+        if windows is None:
+            windows = list(VehicleRateCard.objects.values_list('id', 'validity_start', 'validity_end'))
+            cache.set(windows_key, windows)
+        rate_cards = sorted(pk for pk, start, end in windows if start <= p_date <= end)
+        raw = f"{from_keys}|{to_keys}|{rate_cards}|{versions}"
+        return f"cab-search:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def search(self, from_keys, to_keys, p_date):
+        # Indexed lookup on the route table built from the rate cards valid for the date
+        routes = VehicleRoute.objects.filter(
+            from_key__in=from_keys,
+            to_key__in=to_keys,
             validity_start__lte=p_date,
-            validity_end__gte=p_date
-        )
+            validity_end__gte=p_date,
+            vehicle__isnull=False,
+        ).select_related('vehicle__brand').order_by('price', 'id')
 
-        available_options = []
-        for rc in rate_cards:
-            column_vehicles = [v.strip() if v else "" for v in (rc.column_vehicles or [])]
-            
-            for route in rc.routes:
-                # Case-insensitive city matching with stripping
-                rc_from = str(route.get('start_city', '')).strip().lower()
-                rc_to = str(route.get('drop_city', '')).strip().lower()
-
-                # Robust matching: match if both cities are found (exact or partial)
-                from_matched = (rc_from == from_city) or (rc_from in from_city) or (from_city in rc_from)
-                to_matched = (rc_to == to_city) or (rc_to in to_city) or (to_city in rc_to)
-                
-                if from_matched and to_matched:
-                    # Found a match!
-                    for i, v_name in enumerate(column_vehicles):
-                        if not v_name: continue
-                        
-                        price = route.get(f'v{i+1}')
-                        if price and str(price).strip() != "" and str(price).strip() != "0":
-                            # Try exact model match first, then full name match
-                            vehicle = VehicleMaster.objects.filter(name__iexact=v_name).first()
-                            if not vehicle:
-                                # Try matching against brand + name
-                                all_v = VehicleMaster.objects.all()
-                                for v in all_v:
-                                    full_name = f"{v.brand.name} {v.name}" if v.brand else v.name
-                                    if full_name.lower() == v_name.lower():
-                                        vehicle = v
-                                        break
-                            
-                            if vehicle:
-                                available_options.append({
-                                    "id": vehicle.id,
-                                    "name": vehicle.name,
-                                    "category": vehicle.brand.name if vehicle.brand else "Standard",
-                                    "passengers": vehicle.seating_capacity,
-                                    "bags": vehicle.luggage_capacity,
-                                    "price": price,
-                                    "pickup_point": route.get('start_from'),
-                                    "drop_point": route.get('drop_to'),
-                                    "image": vehicle.photo.url if vehicle.photo else None,
-                                    "description": vehicle.description
-                                })
-        
-        # Deduplicate by name and points to show all unique route options fed in
+        # Deduplicate by name and points, keeping the cheapest option for each
         unique_options = {}
-        for opt in available_options:
-            key = f"{opt['name']}_{opt['pickup_point']}_{opt['drop_point']}"
-            try:
-                # Ensure price is handled safely
-                raw_price = opt.get('price')
-                if raw_price is None or str(raw_price).strip() == "":
-                    price_val = 0.0
-                elif isinstance(raw_price, (int, float)):
-                    price_val = float(raw_price)
-                else:
-                    price_val = float(str(raw_price))
-                
-                if key not in unique_options or price_val < float(unique_options[key].get('price', float('inf'))):
-                    unique_options[key] = opt
-            except (ValueError, TypeError):
-                if key not in unique_options:
-                    unique_options[key] = opt
-
-        return Response(list(unique_options.values()))
+        for route in routes:
+            vehicle = route.vehicle
+            key = f"{vehicle.name}_{route.pickup_point}_{route.drop_point}"
+            if key in unique_options:
+                continue
+            unique_options[key] = {
+                "id": vehicle.id,
+                "name": vehicle.name,
+                "category": vehicle.brand.name if vehicle.brand else "Standard",
+                "passengers": vehicle.seating_capacity,
+                "bags": vehicle.luggage_capacity,
+                # Sent as a string, as the rate card cells were before the route table
+                "price": str(route.price),
+                "pickup_point": route.pickup_point,
+                "drop_point": route.drop_point,
+                "image": vehicle.photo.url if vehicle.photo else None,
+                "description": vehicle.description
+            }
+
+        return list(unique_options.values())
+
+
+class CabSearchStatsAPI(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(get_cache_stats('cab-search'))
+
+
+class CitySuggestAPI(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Autocomplete for city inputs, served from the in-memory city index
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        return Response(get_city_index().suggest(query, limit))
+
 
+class SearchAPI(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # ?q=dubai desert&type=package,sightseeing&page=2&page_size=20
+        # Ranked matches across packages, destinations, sightseeing and visas
+        query = request.query_params.get('q', '').strip()
+        types = [
+            value for value in request.query_params.get('type', '').split(',') if value in SEARCH_SOURCES
+        ] or list(SEARCH_SOURCES)
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 50)
+            page = max(int(request.query_params.get('page', 1)), 1)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        offset = (page - 1) * page_size
+        if offset + page_size > MAX_RESULTS:
+            return Response({"error": f"Only the first {MAX_RESULTS} results can be paged"}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts, results = search_catalogue(query, types, offset, page_size) if query else ({}, [])
+        count = sum(counts.values())
+        has_next = offset + page_size < min(count, MAX_RESULTS)
+        return Response({
+            "query": query,
+            "count": count,
+            "counts": counts,
+            "next": replace_query_param(request.build_absolute_uri(), 'page', page + 1) if has_next else None,
+            "results": results,
+        })
@@ -101,11 +101,37 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', 'Goimomi@123'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Reuse connections across requests for this many seconds (0 = close
+        # after every request) and check them before reuse
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        # Required when connecting through PgBouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
+        },
     }
 }
 
 
 
+# Cache
+# The "api" cache holds rendered responses for the master-data endpoints.
+# Swap the backend through env, e.g. django.core.cache.backends.filebased.FileBasedCache
+# with a directory, or django.core.cache.backends.redis.RedisCache with a redis:// URL.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': os.getenv('API_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('API_CACHE_LOCATION', 'goimomi-api'),
+        'TIMEOUT': int(os.getenv('API_CACHE_TIMEOUT', 3600)),
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -146,6 +172,21 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Set MEDIA_CONTENT_ADDRESSED=True to store each upload once under its SHA-256
+# (Holidays/storage.py); run gc_media_blobs to delete unreferenced blobs
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            'Holidays.storage.ContentAddressedStorage'
+            if os.getenv('MEDIA_CONTENT_ADDRESSED', 'False') == 'True'
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
@@ -174,8 +215,18 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Uploads
+# Group visa applications send three or more files per applicant
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv('DATA_UPLOAD_MAX_NUMBER_FILES', 500))
+# Resumable uploads (/api/uploads/) stage their chunks here until attached,
+# when the file is saved to media storage. With several web nodes this must
+# be a volume they all mount.
+UPLOAD_SESSION_DIR = os.getenv('UPLOAD_SESSION_DIR', BASE_DIR / 'upload_sessions')
+UPLOAD_SESSION_MAX_SIZE = int(os.getenv('UPLOAD_SESSION_MAX_SIZE', 500 * 1024 * 1024))
+
 # Email Settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER', 'hello@goimomi.com')
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))